@@ -1,38 +1,777 @@
 import io
 import base64
-from flask import Flask, request, jsonify
+import contextlib
+import copy
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import posixpath
+import re
+import shutil
+import signal
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from flask import Flask, Response, request, jsonify, send_file, abort
 from flask_cors import CORS
 import traceback
 
+
+def open_input_file(input_file):
+    """
+    Returns a seekable binary file object for a checker input.
+    Accepts a base64 string (legacy JSON clients), raw bytes, or an already open binary file/stream.
+    """
+    if isinstance(input_file, str):
+        return io.BytesIO(base64.b64decode(input_file))
+    if isinstance(input_file, (bytes, bytearray)):
+        return io.BytesIO(input_file)
+    input_file.seek(0)
+    return input_file
+
+def report_progress(progress, message, current, total):
+    """Sends a progress event (e.g. "Slide 37/400") to a checker's optional progress callback."""
+    if progress is not None:
+        progress({'message': message, 'current': current, 'total': total})
+
+
 # --- Python-docx imports and functions (for Word) ---
 from docx import Document
 from docx.shared import RGBColor, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
+from docx.opc.constants import RELATIONSHIP_TYPE as WORD_RT
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+
+# Document-level issue messages, shared by the full checker and the streaming scanner
+WORD_ISSUES = {
+    'macros': (
+        'VBA Macros: This document might contain VBA macros, which are not supported in Google Docs and will be lost upon conversion. Consider converting macro functionality to Google Apps Script if needed.'),
+    'comments': (
+        'Comments: This document contains comments. While Google Docs supports comments, their appearance and exact positioning might differ after conversion. Original comments will be recreated as new comments in this report and their associated paragraphs highlighted.'),
+    'tracked_changes': (
+        'Tracked Changes/Revisions: This document contains tracked changes (insertions, deletions, formatting changes). While Google Docs has similar functionality, the way these revisions are displayed or handled (e.g., accepting/rejecting) might differ post-conversion. It is recommended to accept or reject all changes before conversion for a cleaner document.'),
+    'charts': (
+        'Charts: This document contains charts. Google Docs converts them to static images or linked Google Sheets charts, so their data links, formatting and interactivity may be lost.'),
+    'diagrams': (
+        'SmartArt: This document contains SmartArt diagrams, which Google Docs converts to flat drawings or images that can no longer be edited as SmartArt.'),
+    'drawings': (
+        'Drawings and Text Boxes: This document contains drawing shapes, text boxes or drawing canvases. Google Docs supports only basic drawings, so their positioning, text wrapping and effects may change.'),
+    'embedded_objects': (
+        'Embedded Objects: This document contains embedded OLE objects or workbooks. Google Docs keeps at most a static preview image; the embedded content cannot be opened or edited after conversion.'),
+    'fonts': (
+        'Unsupported Fonts: This document uses fonts that Google Docs does not offer. They will be replaced by a default font, which changes text width, line breaks and pagination. Consider switching to a font available in Google Docs before converting.'),
+    'merged_cells': (
+        'Merged Cells: This document contains tables with merged cells. While Google Docs supports merging, merged layouts may shift and cells merged across rows may break differently across pages. Review these tables after conversion.'),
+}
+
+
+# Children of w:pPr that follow w:shd in the schema's element order
+PPR_SHD_SUCCESSORS = (
+    'w:tabs', 'w:suppressAutoHyphens', 'w:kinsoku', 'w:wordWrap', 'w:overflowPunct', 'w:topLinePunct',
+    'w:autoSpaceDE', 'w:autoSpaceDN', 'w:bidi', 'w:adjustRightInd', 'w:snapToGrid', 'w:spacing', 'w:ind',
+    'w:contextualSpacing', 'w:mirrorIndents', 'w:suppressOverlap', 'w:jc', 'w:textDirection', 'w:textAlignment',
+    'w:textboxTightWrap', 'w:outlineLvl', 'w:divId', 'w:cnfStyle', 'w:rPr', 'w:sectPr', 'w:pPrChange',
+)
 
 
 def add_paragraph_background(paragraph, color_hex):
     """
-    Adds a background shade to a paragraph in a Word document.
+    Adds a background shade to a paragraph in a Word document, replacing any shading it already has.
     color_hex should be an RGB hex string (e.g., "FFFFCC" for light yellow).
     """
     p_pr = paragraph._element.get_or_add_pPr()
+    for existing in p_pr.findall(qn('w:shd')):
+        p_pr.remove(existing)
     shd = OxmlElement('w:shd')
     shd.set(qn('w:val'), 'clear')  # Defines shading type (clear means solid fill)
     shd.set(qn('w:fill'), color_hex)  # Sets the fill color
-    p_pr.append(shd)
+    p_pr.insert_element_before(shd, *PPR_SHD_SUCCESSORS)
+
+
+def paragraph_positions(root):
+    """Maps every w:p element under root to its 1-based position in document order (tables included)."""
+    return {p: idx for idx, p in enumerate(root.iter(qn('w:p')), 1)}
+
+
+COMMENT_MARKER_TAGS = (qn('w:commentRangeStart'), qn('w:commentRangeEnd'), qn('w:commentReference'))
+
+
+def index_comment_references(root):
+    """
+    Maps the 1-based position of every w:p under root (as numbered by paragraph_positions) to the ids of
+    the comments anchored on it, in one pass over the paragraphs and comment markers in document order.
+    A comment is anchored on every paragraph from its w:commentRangeStart to its w:commentRangeEnd, and on
+    the paragraph holding its w:commentReference.
+    """
+    paragraph_tag = qn('w:p')
+    start_tag, end_tag, _ = COMMENT_MARKER_TAGS
+    index = {}
+    open_ranges = {}  # Ordered set of comment ids whose range covers the current paragraph
+    position = 0
+    for element in root.iter(paragraph_tag, *COMMENT_MARKER_TAGS):
+        if element.tag == paragraph_tag:
+            position += 1
+            if open_ranges:
+                index[position] = dict(open_ranges)
+            continue
+        comment_id = int(element.get(qn('w:id')))
+        if element.tag == start_tag:
+            open_ranges[comment_id] = None
+        elif element.tag == end_tag:
+            open_ranges.pop(comment_id, None)
+        if position and next(element.iterancestors(paragraph_tag), None) is not None:
+            index.setdefault(position, {})[comment_id] = None
+    return {position: list(comment_ids) for position, comment_ids in index.items()}
+
+
+def annotate_commented_paragraph(new_doc, new_paragraph, comment_ids, original_comments, recreated_comments):
+    """
+    Highlights a copied paragraph that carried comments and re-creates each original comment once,
+    anchored on the first copied paragraph it covered. recreated_comments tracks the ids already re-created.
+    """
+    add_paragraph_background(new_paragraph, "FFFFCC")  # Light yellow background
+    new_ids = [comment_id for comment_id in comment_ids
+               if comment_id in original_comments and comment_id not in recreated_comments]
+    if not new_ids:
+        return
+    recreated_comments.update(new_ids)
+    anchor_runs = new_paragraph.runs or [new_paragraph.add_run()]
+    # add_comment() puts each line of text in its own comment paragraph
+    text = '\n'.join(f"Original Comment (ID: {comment_id}): {original_comments[comment_id]}" for comment_id in new_ids)
+    new_doc.add_comment(anchor_runs, text=text, author='Compatibility Checker', initials='CC')
+
+
+# Revision markup: w:ins/w:del/w:moveFrom/w:moveTo wrap the runs they change, and w:rPrChange/w:pPrChange
+# sit in the properties of the run or paragraph whose formatting changed.
+REVISION_TAGS = tuple(qn(f'w:{tag}') for tag in ('ins', 'del', 'moveFrom', 'moveTo', 'rPrChange', 'pPrChange'))
+# Relationship types (last URI segment) of the main part's other content parts, scanned after the body
+STORY_RELATIONSHIP_TYPES = ('header', 'footer', 'footnotes', 'endnotes')
+
+
+def describe_tracked_changes(tracked_changes, max_locations=10):
+    """Summarizes tracked changes found by scan_word_part() as a sentence, e.g. 'Found 2 w:ins, 1 w:del in document.xml paragraphs 3, 7.'"""
+    counts = ', '.join(f'{count} w:{tag}' for tag, count in tracked_changes['counts'].items())
+    by_part = {}
+    for location in tracked_changes['locations']:
+        paragraphs = by_part.setdefault(location['part'], [])
+        if location['paragraph'] is not None and location['paragraph'] not in paragraphs:
+            paragraphs.append(location['paragraph'])
+    places = []
+    for part, paragraphs in by_part.items():
+        shown = ', '.join(str(p) for p in sorted(paragraphs)[:max_locations])
+        more = f' and {len(paragraphs) - max_locations} more' if len(paragraphs) > max_locations else ''
+        places.append(f'{part} paragraphs {shown}{more}' if paragraphs else part)
+    return f"Found {counts}{' in ' + '; '.join(places) if places else ''}."
+
+
+# Cell properties that merge a cell with its neighbours: w:gridSpan across columns, w:vMerge down rows
+MERGE_TAGS = (qn('w:gridSpan'), qn('w:vMerge'))
+
+
+def describe_merged_cells(merged_cells, max_locations=10):
+    """Summarizes merged cells found by scan_word_part() as a sentence, e.g. 'Found 2 merged cells: table 1 row 1 column 1, ...'"""
+    shown = ', '.join(f"table {cell['table']} row {cell['row']} column {cell['column']}"
+                      for cell in merged_cells[:max_locations])
+    more = f' and {len(merged_cells) - max_locations} more' if len(merged_cells) > max_locations else ''
+    return f"Found {len(merged_cells)} merged cell{'s' if len(merged_cells) != 1 else ''}: {shown}{more}."
+
+
+# --- Word object inventory ---
+# Images, charts, SmartArt, drawings and embedded objects are found from the drawing markup in the body,
+# headers, footers and notes, and sized from their package parts without decoding them.
+IMAGE_MAX_MB = int(os.environ.get('IMAGE_MAX_MB', 50))  # Google Docs import limits per image
+IMAGE_MAX_MEGAPIXELS = int(os.environ.get('IMAGE_MAX_MEGAPIXELS', 25))
+IMAGE_HEADER_BYTES = 256 * 1024  # Enough to reach the frame header of a JPEG with a large EXIF block
+
+DRAWINGML_NS = 'http://schemas.openxmlformats.org/drawingml/2006/'
+# a:graphicData uri -> inventory type; any other uri is a drawing (shape, group, canvas, ink, ...)
+GRAPHIC_DATA_TYPES = {
+    DRAWINGML_NS + 'picture': 'image',
+    DRAWINGML_NS + 'chart': 'chart',
+    DRAWINGML_NS + 'diagram': 'diagram',
+}
+# Inventory type -> WORD_ISSUES key for the types reported as a group
+OBJECT_TYPE_ISSUES = {'chart': 'charts', 'diagram': 'diagrams', 'drawing': 'drawings',
+                      'ole': 'embedded_objects', 'workbook': 'embedded_objects'}
+GRAPHIC_DATA_TAG = '{http://schemas.openxmlformats.org/drawingml/2006/main}graphicData'
+OBJECT_TAGS = (GRAPHIC_DATA_TAG, qn('w:object'), qn('w:pict'))
+FALLBACK_TAG = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+VML_IMAGE_DATA_TAG = '{urn:schemas-microsoft-com:vml}imagedata'
+OLE_OBJECT_TAG = '{urn:schemas-microsoft-com:office:office}OLEObject'
+JPEG_FRAME_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def classify_word_object(element):
+    """
+    Returns (type, relationship id) for an a:graphicData, w:object or w:pict element, or None when the
+    element is a legacy fallback copy of a drawing counted elsewhere or a w:pict without an image.
+    The relationship id, when there is one, points at the image, chart, diagram data or embedded part.
+    """
+    if any(ancestor.tag == FALLBACK_TAG for ancestor in element.iterancestors()):
+        return None
+    if element.tag == GRAPHIC_DATA_TAG:
+        object_type = GRAPHIC_DATA_TYPES.get(element.get('uri'), 'drawing')
+        rel_id = None
+        for child in element.iter():
+            rel_id = (child.get(RELATIONSHIPS_NS + 'embed') or child.get(RELATIONSHIPS_NS + 'id')
+                      or child.get(RELATIONSHIPS_NS + 'dm'))
+            if rel_id:
+                break
+        return object_type, rel_id
+    if element.tag == qn('w:object'):
+        ole = next(element.iter(OLE_OBJECT_TAG), None)
+        if ole is None:
+            return 'ole', None
+        object_type = 'workbook' if (ole.get('ProgID') or '').startswith('Excel.') else 'ole'
+        return object_type, ole.get(RELATIONSHIPS_NS + 'id')
+    image_data = next(element.iter(VML_IMAGE_DATA_TAG), None)
+    if image_data is None:
+        return None
+    return 'image', image_data.get(RELATIONSHIPS_NS + 'id')
+
+
+def image_pixel_size(header):
+    """Reads (width, height) in pixels from the first bytes of a PNG, GIF, BMP or JPEG, or returns None."""
+    if header[:8] == b'\x89PNG\r\n\x1a\n' and len(header) >= 24:
+        return int.from_bytes(header[16:20], 'big'), int.from_bytes(header[20:24], 'big')
+    if header[:6] in (b'GIF87a', b'GIF89a') and len(header) >= 10:
+        return int.from_bytes(header[6:8], 'little'), int.from_bytes(header[8:10], 'little')
+    if header[:2] == b'BM' and len(header) >= 26:
+        return int.from_bytes(header[18:22], 'little'), abs(int.from_bytes(header[22:26], 'little', signed=True))
+    if header[:2] == b'\xff\xd8':
+        idx = 2
+        while idx + 9 < len(header):
+            if header[idx] != 0xFF:
+                return None
+            marker = header[idx + 1]
+            if marker == 0xFF:  # Fill byte
+                idx += 1
+            elif marker in JPEG_FRAME_MARKERS:
+                return int.from_bytes(header[idx + 7:idx + 9], 'big'), int.from_bytes(header[idx + 5:idx + 7], 'big')
+            else:
+                idx += 2 + int.from_bytes(header[idx + 2:idx + 4], 'big')
+    return None
+
+
+def word_object_entry(object_type, partname, paragraph, target, size, header):
+    """Builds an inventory entry; target, size and header describe the related part and may be None."""
+    entry = {'type': object_type, 'part': partname, 'paragraph': paragraph, 'target': target, 'size': size}
+    if object_type == 'image' and header is not None:
+        dimensions = image_pixel_size(header)
+        if dimensions is not None:
+            entry['width'], entry['height'] = dimensions
+    return entry
+
+
+def is_oversized_image(entry):
+    """Returns True for an inventory image beyond IMAGE_MAX_MB or IMAGE_MAX_MEGAPIXELS."""
+    if entry['type'] != 'image':
+        return False
+    megapixels = entry.get('width', 0) * entry.get('height', 0) / 1e6
+    return megapixels > IMAGE_MAX_MEGAPIXELS or (entry['size'] or 0) > IMAGE_MAX_MB * 2 ** 20
+
+
+def word_object_issues(objects, max_locations=10):
+    """
+    Turns an object inventory into issues: one per group of charts, SmartArt, drawings and embedded
+    objects with their locations, and one per image beyond IMAGE_MAX_MB or IMAGE_MAX_MEGAPIXELS.
+    """
+    issues = []
+    grouped = {}
+    for entry in objects:
+        if entry['type'] in OBJECT_TYPE_ISSUES:
+            grouped.setdefault(OBJECT_TYPE_ISSUES[entry['type']], []).append(entry)
+    for key, entries in grouped.items():
+        places = ', '.join(f"{entry['part']} paragraph {entry['paragraph']}" if entry['paragraph'] else entry['part']
+                           for entry in entries[:max_locations])
+        more = f' and {len(entries) - max_locations} more' if len(entries) > max_locations else ''
+        issues.append(f"{WORD_ISSUES[key]} Found {len(entries)}: {places}{more}.")
+
+    for entry in objects:
+        if not is_oversized_image(entry):
+            continue
+        megapixels = entry.get('width', 0) * entry.get('height', 0) / 1e6
+        megabytes = (entry['size'] or 0) / 2 ** 20
+        place = f"{entry['part']} paragraph {entry['paragraph']}" if entry['paragraph'] else entry['part']
+        size = f"{entry['width']}x{entry['height']} px, {megapixels:.1f} MP, " if 'width' in entry else ''
+        issues.append(
+            f"Oversized Image: The image {entry['target']} in {place} ({size}{megabytes:.1f} MB) is beyond Google "
+            f"Docs' import limits of {IMAGE_MAX_MB} MB and {IMAGE_MAX_MEGAPIXELS} megapixels per image. It may be "
+            f"dropped or downscaled on conversion; resize or compress it first.")
+    return issues
+
+
+# --- Word font inventory ---
+# Fonts are collected from every w:rFonts in the body, headers, footers, notes, used styles and numbered list
+# levels, with theme references such as w:asciiTheme="minorHAnsi" resolved through the theme's font scheme.
+# Bullet levels are skipped: Google Docs replaces Symbol/Wingdings bullet glyphs with its own.
+DRAWINGML_MAIN_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+# (explicit attribute, theme attribute) pairs on w:rFonts; a theme attribute overrides the explicit font
+RFONTS_ATTRIBUTES = tuple((qn(f'w:{name}'), qn(f'w:{theme}'))
+                          for name, theme in (('ascii', 'asciiTheme'), ('hAnsi', 'hAnsiTheme'),
+                                              ('eastAsia', 'eastAsiaTheme'), ('cs', 'cstheme')))
+# Theme font scheme script -> suffixes of the theme references that use it
+THEME_FONT_SCRIPTS = {'latin': ('Ascii', 'HAnsi'), 'ea': ('EastAsia',), 'cs': ('Bidi',)}
+THEME_MAX_BYTES = 4 * 1024 * 1024  # A real theme is a few KB; the streaming scanner skips anything larger
+STYLES_PART_NAME = '/word/styles.xml'
+NUMBERING_PART_NAME = '/word/numbering.xml'
+
+# Casefolded families Google Docs renders as-is: its font menu (including the Microsoft core fonts it
+# licenses and their metric-compatible stand-ins) and the most used Google Fonts families.
+# Any other font is substituted on import.
+GOOGLE_DOCS_FONTS = frozenset({
+    'abril fatface', 'alegreya', 'alegreya sans', 'amatic sc', 'anton', 'architects daughter', 'archivo', 'arial',
+    'arial black', 'arial narrow', 'arimo', 'arvo', 'asap', 'assistant', 'barlow', 'barlow condensed', 'bebas neue',
+    'bitter', 'cabin', 'cairo', 'caladea', 'calibri', 'cambria', 'cardo', 'carlito', 'catamaran', 'caveat',
+    'cinzel', 'comfortaa', 'comic sans ms', 'cormorant garamond', 'courier new', 'courier prime', 'cousine',
+    'crimson pro', 'crimson text', 'dm sans', 'dm serif display', 'dancing script', 'domine', 'dosis',
+    'eb garamond', 'exo 2', 'fira code', 'fira mono', 'fira sans', 'fredoka', 'gelasio', 'georgia',
+    'gloria hallelujah', 'great vibes', 'heebo', 'hind', 'ibm plex mono', 'ibm plex sans', 'ibm plex serif',
+    'impact', 'inconsolata', 'indie flower', 'inter', 'josefin sans', 'kalam', 'kanit', 'karla', 'lato', 'lexend',
+    'lexend deca', 'libre baskerville', 'libre franklin', 'literata', 'lobster', 'lora', 'manrope', 'maven pro',
+    'merienda', 'merriweather', 'merriweather sans', 'montserrat', 'mulish', 'noticia text', 'noto sans',
+    'noto sans jp', 'noto sans kr', 'noto sans mono', 'noto sans sc', 'noto sans tc', 'noto serif', 'noto serif jp',
+    'nunito', 'nunito sans', 'old standard tt', 'open sans', 'orbitron', 'oswald', 'overpass', 'oxygen', 'pt mono',
+    'pt sans', 'pt sans narrow', 'pt serif', 'pacifico', 'patrick hand', 'permanent marker', 'philosopher',
+    'playfair display', 'playfair display sc', 'poppins', 'prompt', 'proxima nova', 'questrial', 'quicksand',
+    'rajdhani', 'raleway', 'righteous', 'roboto', 'roboto condensed', 'roboto flex', 'roboto mono', 'roboto serif',
+    'roboto slab', 'rubik', 'sacramento', 'sarabun', 'satisfy', 'shadows into light', 'signika', 'slabo 27px',
+    'source code pro', 'source sans pro', 'source serif pro', 'space grotesk', 'space mono', 'special elite',
+    'spectral', 'tangerine', 'teko', 'times new roman', 'tinos', 'titillium web', 'trebuchet ms', 'ubuntu',
+    'ubuntu condensed', 'ubuntu mono', 'ultra', 'varela round', 'verdana', 'volkhov', 'vollkorn', 'work sans',
+    'yanone kaffeesatz', 'zeyada', 'zilla slab',
+})
+
+
+def read_theme_fonts(theme_xml):
+    """Maps theme font references ('minorHAnsi', 'majorBidi', ...) to typefaces from a theme part's font scheme."""
+    root = etree.fromstring(theme_xml, etree.XMLParser(resolve_entities=False, no_network=True))
+    theme_fonts = {}
+    for group in ('major', 'minor'):
+        font = root.find(f'.//{DRAWINGML_MAIN_NS}{group}Font')
+        if font is None:
+            continue
+        for script, suffixes in THEME_FONT_SCRIPTS.items():
+            typeface = font.find(DRAWINGML_MAIN_NS + script)
+            if typeface is not None and typeface.get('typeface'):
+                for suffix in suffixes:
+                    theme_fonts[group + suffix] = typeface.get('typeface')
+    return theme_fonts
+
+
+class WordFontInventory:
+    """
+    Counts font uses: one per distinct font of every w:rFonts in the content, in numbered list levels,
+    in the document defaults and in the styles the content uses (with the styles they are based on).
+    Style definitions are collected as they are read and only counted by counts(), once the content has
+    shown which styles are in use, so unused built-in styles do not report their fonts.
+    """
+
+    def __init__(self, theme_fonts):
+        self.theme_fonts = theme_fonts
+        self.font_counts = {}
+        self.used_styles = set()
+        self.styles = {}  # style id -> (basedOn style id, is a default style, [font names per w:rFonts])
+
+    def _fonts(self, r_fonts):
+        names = set()
+        for attribute, theme_attribute in RFONTS_ATTRIBUTES:
+            theme_reference = r_fonts.get(theme_attribute)
+            name = self.theme_fonts.get(theme_reference) if theme_reference else r_fonts.get(attribute)
+            if name and name.strip():
+                names.add(name.strip())
+        return names
+
+    def add_rfonts(self, r_fonts):
+        """Counts a w:rFonts element from the content or the document defaults."""
+        for name in self._fonts(r_fonts):
+            self.font_counts[name] = self.font_counts.get(name, 0) + 1
+
+    def add_counts(self, font_counts):
+        """Adds {font name: uses} counted elsewhere, e.g. cached for another part."""
+        for name, count in font_counts.items():
+            self.font_counts[name] = self.font_counts.get(name, 0) + count
+
+    def add_level(self, level):
+        """Counts the label fonts of a w:lvl numbering level, unless it is a bullet level."""
+        num_fmt = level.find(qn('w:numFmt'))
+        if num_fmt is not None and num_fmt.get(qn('w:val')) == 'bullet':
+            return
+        for r_fonts in level.iter(qn('w:rFonts')):
+            self.add_rfonts(r_fonts)
+
+    def add_style_reference(self, style_id):
+        """Records a style used by the content."""
+        self.used_styles.add(style_id)
+
+    def add_style(self, style):
+        """Records a w:style definition from the styles part."""
+        based_on = style.find(qn('w:basedOn'))
+        self.styles[style.get(qn('w:styleId'))] = (
+            based_on.get(qn('w:val')) if based_on is not None else None,
+            style.get(qn('w:default')) in ('1', 'true'),
+            [self._fonts(r_fonts) for r_fonts in style.iter(qn('w:rFonts'))])
+
+    def counts(self):
+        """Returns {font name: uses}, adding the fonts of the used and default styles."""
+        counts = dict(self.font_counts)
+        pending = list(self.used_styles)
+        pending += [style_id for style_id, (_, is_default, _) in self.styles.items() if is_default]
+        counted = set()
+        while pending:
+            style_id = pending.pop()
+            if style_id in counted or style_id not in self.styles:
+                continue
+            counted.add(style_id)
+            based_on, _, font_sets = self.styles[style_id]
+            for names in font_sets:
+                for name in names:
+                    counts[name] = counts.get(name, 0) + 1
+            if based_on:
+                pending.append(based_on)
+        return counts
+
+
+def word_font_issues(font_counts, max_fonts=10):
+    """Returns an issue listing the fonts Google Docs does not offer, most used first, or no issues."""
+    unsupported = sorted(((count, name) for name, count in font_counts.items()
+                          if name.casefold() not in GOOGLE_DOCS_FONTS), key=lambda item: (-item[0], item[1]))
+    if not unsupported:
+        return []
+    shown = ', '.join(f"{name} ({count} use{'s' if count != 1 else ''})" for count, name in unsupported[:max_fonts])
+    more = f' and {len(unsupported) - max_fonts} more' if len(unsupported) > max_fonts else ''
+    return [f'{WORD_ISSUES["fonts"]} Found: {shown}{more}.']
+
+
+# --- Compact Word reports ---
+# mode="compact" copies only the body blocks holding flagged paragraphs, each with a few blocks of context.
+WORD_COMPACT_CONTEXT_BLOCKS = int(os.environ.get('WORD_COMPACT_CONTEXT_BLOCKS', 2))
+
+# Inventory type -> reason a paragraph holding it is flagged
+OBJECT_FLAG_REASONS = {'chart': 'chart', 'diagram': 'SmartArt', 'drawing': 'drawing',
+                       'ole': 'embedded object', 'workbook': 'embedded workbook'}
+
+
+def flag_word_paragraphs(doc, comment_index, tracked_changes, merged_cells, objects):
+    """
+    Maps the body paragraph positions (as numbered by paragraph_positions) that carry an issue to the
+    reasons they are flagged: comments, tracked changes, charts and other objects, oversized images,
+    and the first paragraph of each table with merged cells.
+    """
+    main_part = doc.part.partname.rsplit('/', 1)[-1]
+    flagged = [(position, 'comment') for position in comment_index]
+    flagged += [(location['paragraph'], 'tracked change') for location in tracked_changes['locations']
+                if location['part'] == main_part]
+    for entry in objects:
+        if entry['part'] == main_part and is_oversized_image(entry):
+            flagged.append((entry['paragraph'], 'oversized image'))
+        elif entry['part'] == main_part and entry['type'] in OBJECT_FLAG_REASONS:
+            flagged.append((entry['paragraph'], OBJECT_FLAG_REASONS[entry['type']]))
+    if merged_cells:
+        positions = paragraph_positions(doc.element.body)
+        tables = list(doc.element.body.iter(qn('w:tbl')))
+        for table_number in sorted({cell['table'] for cell in merged_cells}):
+            first_paragraph = next(tables[table_number - 1].iter(qn('w:p')), None)
+            flagged.append((positions.get(first_paragraph), 'merged cells'))
+
+    flags = {}
+    for position, reason in flagged:
+        if position is not None and reason not in flags.setdefault(position, []):
+            flags[position].append(reason)
+    return flags
+
+
+def compact_block_ranges(blocks, body_positions, flags, context=WORD_COMPACT_CONTEXT_BLOCKS):
+    """
+    Returns the [first, last] block index ranges a compact report copies: every block holding a flagged
+    paragraph, widened by context blocks on each side, with overlapping or touching ranges merged.
+    """
+    ranges = []
+    for block_idx, block in enumerate(blocks):
+        if not any(body_positions[p] in flags for p in block.iter(qn('w:p'))):
+            continue
+        first, last = max(block_idx - context, 0), min(block_idx + context, len(blocks) - 1)
+        if ranges and first <= ranges[-1][1] + 1:
+            ranges[-1][1] = max(ranges[-1][1], last)
+        else:
+            ranges.append([first, last])
+    return ranges
 
 
-def check_word_google_docs_compatibility(input_file_base64, original_filename="document.docx"):
+def compact_range_label(blocks, first, last, body_positions, flags):
+    """Describes a compact report range, e.g. 'Original paragraphs 40-46. Flagged: paragraph 42 (comment).'"""
+    positions = [body_positions[p] for block in blocks[first:last + 1] for p in block.iter(qn('w:p'))]
+    if not positions:
+        return 'Flagged content.'
+    flagged = '; '.join(f"paragraph {position} ({', '.join(flags[position])})"
+                        for position in positions if position in flags)
+    return f'Original paragraphs {positions[0]}-{positions[-1]}. Flagged: {flagged}.'
+
+
+# Body children copied into the report; the body's own w:sectPr stays with the report's page setup
+COPIED_BLOCK_TAGS = (qn('w:p'), qn('w:tbl'), qn('w:sdt'))
+STYLE_REFERENCE_TAGS = (qn('w:pStyle'), qn('w:rStyle'), qn('w:tblStyle'))
+# Markup pointing into parts the report does not copy: comments (re-created separately), notes, headers and footers
+UNCOPIED_REFERENCE_TAGS = COMMENT_MARKER_TAGS + (qn('w:footnoteReference'), qn('w:endnoteReference'),
+                                                 qn('w:headerReference'), qn('w:footerReference'))
+# Relationship references (r:id, r:embed, r:link, r:dm, ...) are all attributes in this namespace
+RELATIONSHIPS_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+
+class WordStyleResolver:
+    """
+    Resolves source style ids to report style ids, once per distinct style for the whole report.
+    A style the report already has (by id or by name) is reused; any other style defined in the source
+    is imported into the report's styles part along with the styles it is based on. References to
+    undefined styles resolve to None, meaning the default style applies.
+    """
+
+    def __init__(self, source_doc, target_doc, numbering=None):
+        self.numbering = numbering
+        self.source_styles = {style.get(qn('w:styleId')): style
+                              for style in source_doc.styles.element.iterchildren(qn('w:style'))}
+        self.target_styles = target_doc.styles.element
+        self.target_ids = set()
+        self.target_ids_by_name = {}
+        for style in self.target_styles.iterchildren(qn('w:style')):
+            self.target_ids.add(style.get(qn('w:styleId')))
+            name = style.find(qn('w:name'))
+            if name is not None:
+                self.target_ids_by_name[name.get(qn('w:val'))] = style.get(qn('w:styleId'))
+        self.resolved = {}
+
+    def resolve(self, style_id):
+        """Returns the report style id to use for source style_id, or None for the default style."""
+        if style_id not in self.resolved:
+            self.resolved[style_id] = None  # Guards against basedOn cycles while importing
+            self.resolved[style_id] = self._resolve(style_id)
+        return self.resolved[style_id]
+
+    def _resolve(self, style_id):
+        if style_id in self.target_ids:
+            return style_id
+        source_style = self.source_styles.get(style_id)
+        if source_style is None:
+            return None
+        name = source_style.find(qn('w:name'))
+        if name is not None and name.get(qn('w:val')) in self.target_ids_by_name:
+            return self.target_ids_by_name[name.get(qn('w:val'))]
+
+        imported = copy.deepcopy(source_style)
+        for link in list(imported.iterchildren(qn('w:basedOn'), qn('w:next'), qn('w:link'))):
+            linked_id = self.resolve(link.get(qn('w:val')))
+            if linked_id is None:
+                imported.remove(link)
+            else:
+                link.set(qn('w:val'), linked_id)
+        imported.attrib.pop(qn('w:default'), None)  # The report keeps its own default styles
+        if self.numbering is not None:
+            self.numbering.remap(imported)
+        self.target_styles.append(imported)
+        self.target_ids.add(style_id)
+        return style_id
+
+
+class WordNumberingResolver:
+    """
+    Resolves source list ids (w:numId) to report list ids, once per distinct list for the whole report.
+    Each source w:num is imported into the report's numbering part under a new id, along with the
+    w:abstractNum it instantiates, so copied lists keep their own numbering and bullets rather than picking
+    up the report template's list definitions. References to undefined lists resolve to None.
+    """
+
+    def __init__(self, source_doc, target_doc):
+        try:
+            source_numbering = source_doc.part.part_related_by(WORD_RT.NUMBERING).element
+        except KeyError:
+            source_numbering = None
+        self.source_nums = {}
+        self.source_abstract_nums = {}
+        if source_numbering is not None:
+            self.source_nums = {num.get(qn('w:numId')): num for num in source_numbering.iterchildren(qn('w:num'))}
+            self.source_abstract_nums = {abstract.get(qn('w:abstractNumId')): abstract
+                                         for abstract in source_numbering.iterchildren(qn('w:abstractNum'))}
+        self.target_doc = target_doc
+        self.target_numbering = None  # Loaded on first import
+        self.styles = None  # Set by WordBodyCopier; resolves the styles list levels refer to
+        self.resolved = {'0': '0'}  # numId 0 switches numbering off and needs no definition
+        self.abstract_ids = {}
+
+    def resolve(self, num_id):
+        """Returns the report list id to use for source list num_id, or None if the source does not define it."""
+        if num_id not in self.resolved:
+            source_num = self.source_nums.get(num_id)
+            self.resolved[num_id] = self._import(source_num) if source_num is not None else None
+        return self.resolved[num_id]
+
+    def remap(self, element):
+        """Points every w:numPr/w:numId under element at the report's lists, dropping numbering without a definition."""
+        for num_id in list(element.iter(qn('w:numId'))):
+            num_pr = num_id.getparent()
+            if num_pr is None or num_pr.tag != qn('w:numPr'):
+                continue
+            target_id = self.resolve(num_id.get(qn('w:val')))
+            if target_id is None:
+                num_pr.getparent().remove(num_pr)
+            else:
+                num_id.set(qn('w:val'), target_id)
+
+    def _next_id(self, tag, attribute):
+        return str(max([int(element.get(attribute)) for element in self.target_numbering.iterchildren(tag)]
+                       + [0]) + 1)
+
+    def _import(self, source_num):
+        if self.target_numbering is None:
+            self.target_numbering = self.target_doc.part.numbering_part.element
+        abstract_id = source_num.find(qn('w:abstractNumId'))
+        source_abstract_id = abstract_id.get(qn('w:val')) if abstract_id is not None else None
+        if source_abstract_id not in self.source_abstract_nums:
+            return None
+        if source_abstract_id not in self.abstract_ids:
+            self.abstract_ids[source_abstract_id] = self._import_abstract(self.source_abstract_nums[source_abstract_id])
+
+        num = copy.deepcopy(source_num)
+        num.set(qn('w:numId'), self._next_id(qn('w:num'), qn('w:numId')))
+        num.find(qn('w:abstractNumId')).set(qn('w:val'), self.abstract_ids[source_abstract_id])
+        self._remap_level_styles(num)
+        # w:num elements follow every w:abstractNum and precede w:numIdMacAtCleanup
+        cleanup = self.target_numbering.find(qn('w:numIdMacAtCleanup'))
+        if cleanup is not None:
+            cleanup.addprevious(num)
+        else:
+            self.target_numbering.append(num)
+        return num.get(qn('w:numId'))
+
+    def _import_abstract(self, source_abstract):
+        abstract = copy.deepcopy(source_abstract)
+        abstract_id = self._next_id(qn('w:abstractNum'), qn('w:abstractNumId'))
+        abstract.set(qn('w:abstractNumId'), abstract_id)
+        # Picture bullets live in the source's w:numPicBullet definitions, which are not imported
+        for picture_bullet in list(abstract.iter(qn('w:lvlPicBulletId'))):
+            picture_bullet.getparent().remove(picture_bullet)
+        self._remap_level_styles(abstract)
+        first_num = self.target_numbering.find(qn('w:num'))
+        if first_num is not None:
+            first_num.addprevious(abstract)
+        else:
+            self.target_numbering.append(abstract)
+        return abstract_id
+
+    def _remap_level_styles(self, element):
+        # Level styles (w:lvl/w:pStyle) and style links name styles, which must exist in the report
+        for reference in list(element.iter(qn('w:pStyle'), qn('w:styleLink'), qn('w:numStyleLink'))):
+            style_id = self.styles.resolve(reference.get(qn('w:val'))) if self.styles is not None else None
+            if style_id is None:
+                reference.getparent().remove(reference)
+            else:
+                reference.set(qn('w:val'), style_id)
+
+
+class WordBodyCopier:
+    """
+    Copies body blocks (w:p, w:tbl, w:sdt) from a source document into a report document by deep-copying
+    their XML. Style ids are resolved through a WordStyleResolver and list ids through a
+    WordNumberingResolver; paragraphs whose style cannot be resolved fall back to Normal. Relationship ids are re-created on the report's document part, which
+    brings images, charts and other related parts along and keeps hyperlinks working.
+    """
+
+    def __init__(self, source_doc, target_doc):
+        self.source_part = source_doc.part
+        self.target_part = target_doc.part
+        self.target_body = target_doc.element.body
+        self.numbering = WordNumberingResolver(source_doc, target_doc)
+        self.styles = WordStyleResolver(source_doc, target_doc, self.numbering)
+        self.numbering.styles = self.styles
+        self.rel_ids = {}
+
+    def copy(self, element):
+        """Appends a copy of a source body block to the report body and returns the copy."""
+        clone = copy.deepcopy(element)
+        self._strip_uncopied_references(clone)
+        self._remap_styles(clone)
+        self.numbering.remap(clone)
+        self._remap_relationships(clone)
+        sect_pr = self.target_body.sectPr
+        if sect_pr is not None:
+            sect_pr.addprevious(clone)
+        else:
+            self.target_body.append(clone)
+        return clone
+
+    def _strip_uncopied_references(self, clone):
+        for marker in list(clone.iter(*UNCOPIED_REFERENCE_TAGS)):
+            parent = marker.getparent()
+            parent.remove(marker)
+            # Drop the run that only carried the reference mark
+            if parent.tag == qn('w:r') and all(child.tag == qn('w:rPr') for child in parent):
+                parent.getparent().remove(parent)
+
+    def _remap_styles(self, clone):
+        # Removing a w:pStyle, w:rStyle or w:tblStyle leaves the element on the default (Normal) style
+        for reference in list(clone.iter(*STYLE_REFERENCE_TAGS)):
+            style_id = self.styles.resolve(reference.get(qn('w:val')))
+            if style_id is None:
+                reference.getparent().remove(reference)
+            else:
+                reference.set(qn('w:val'), style_id)
+
+    def _remap_relationships(self, clone):
+        for element in clone.iter():
+            for name, value in element.attrib.items():
+                if name.startswith(RELATIONSHIPS_NS):
+                    target_id = self._target_rel_id(value)
+                    if target_id is not None:
+                        element.set(name, target_id)
+
+    def _target_rel_id(self, source_id):
+        if source_id not in self.rel_ids:
+            rel = self.source_part.rels.get(source_id)
+            if rel is None:
+                self.rel_ids[source_id] = None
+            elif rel.is_external:
+                self.rel_ids[source_id] = self.target_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            else:
+                self.rel_ids[source_id] = self.target_part.relate_to(rel.target_part, rel.reltype)
+        return self.rel_ids[source_id]
+
+
+def check_word_google_docs_compatibility(input_file, original_filename="document.docx", mode="report",
+                                         progress=None):
     """
     Checks a Word document for compatibility issues when converting to Google Docs
     and generates a report.
+    input_file may be a base64 string, raw bytes or a binary file object.
+    In mode="scan" only the issues are detected and no report document is built (output is None).
+    In mode="compact" the report copies only the flagged paragraphs and tables, with some context
+    and their original paragraph numbers, instead of the whole body.
+    Issues are detected by analyse_word_package(), which re-scans only the package parts that changed
+    since a previous check; the document is only loaded with python-docx to build the report.
+    progress, if given, is called with progress events while the parts are scanned and the body is copied.
     """
     try:
-        decoded_bytes = base64.b64decode(input_file_base64)
-        doc_bytes_io = io.BytesIO(decoded_bytes)
-        doc = Document(doc_bytes_io)
+        source = open_input_file(input_file)
+        findings = analyse_word_package(zipfile.ZipFile(source), progress)
+        issues_found = word_findings_issues(findings, mode)
+        if mode == 'scan':
+            return True, None, issues_found
+
+        source.seek(0)
+        doc = Document(source)
+        original_comments = {c.comment_id: c.text for c in doc.comments}
+        tracked_changes, merged_cells, objects = (findings['tracked_changes'], findings['merged_cells'],
+                                                  findings['objects'])
 
         new_doc = Document()
         new_doc.add_heading('Google Docs Compatibility Report', level=1)
@@ -43,33 +782,6 @@ def check_word_google_docs_compatibility(input_file_base64, original_filename="d
             'and specific layout elements might render differently or not at all.')
         new_doc.add_paragraph('')
 
-        issues_found = []
-        original_comments = {c.id: c.text for c in doc.comments}
-
-        # Removed the problematic 'if doc.has_macros:' check as python-docx does not directly support it.
-        # A general warning about macros is still relevant for users.
-        issues_found.append(
-            'VBA Macros: This document might contain VBA macros, which are not supported in Google Docs and will be lost upon conversion. Consider converting macro functionality to Google Apps Script if needed.')
-
-        # Check for Comments
-        if original_comments:
-            issues_found.append(
-                'Comments: This document contains comments. While Google Docs supports comments, their appearance and exact positioning might differ after conversion. Original comments will be recreated as new comments in this report and their associated paragraphs highlighted.')
-
-        # Check for Tracked Changes/Revisions
-        has_revisions = False
-        for paragraph in doc.paragraphs:
-            for run in paragraph.runs:
-                run_xml = run._element.xml
-                if '<w:ins' in run_xml or '<w:del' in run_xml or '<w:rPrChange' in run_xml:
-                    has_revisions = True
-                    break
-            if has_revisions:
-                break
-        if has_revisions:
-            issues_found.append(
-                'Tracked Changes/Revisions: This document contains tracked changes (insertions, deletions, formatting changes). While Google Docs has similar functionality, the way these revisions are displayed or handled (e.g., accepting/rejecting) might differ post-conversion. It is recommended to accept or reject all changes before conversion for a cleaner document.')
-
         # Add summary of issues
         if issues_found:
             new_doc.add_heading('Summary of Potential Issues', level=2)
@@ -80,113 +792,92 @@ def check_word_google_docs_compatibility(input_file_base64, original_filename="d
                 'No major compatibility issues (like macros, comments, or tracked changes) were automatically detected. '
                 'However, always review the converted document in Google Docs for layout and formatting fidelity.')
 
+        body_positions = paragraph_positions(doc.element.body)
+        comment_index = index_comment_references(doc.element.body) if original_comments else {}
+        blocks = list(doc.element.body.iterchildren(*COPIED_BLOCK_TAGS))
+
         new_doc.add_paragraph('')
-        new_doc.add_heading('Original Document Content with Highlights', level=2)
+        if mode == 'compact':
+            flags = flag_word_paragraphs(doc, comment_index, tracked_changes, merged_cells, objects)
+            block_ranges = compact_block_ranges(blocks, body_positions, flags)
+            new_doc.add_heading('Flagged Content from the Original Document', level=2)
+            new_doc.add_paragraph(
+                'This compact report shows only the paragraphs and tables flagged with issues, with '
+                f'{WORD_COMPACT_CONTEXT_BLOCKS} paragraphs or tables of context on each side. Each excerpt starts '
+                'with its paragraph numbers in the original document.')
+            if not block_ranges:
+                new_doc.add_paragraph('No individual paragraphs or tables were flagged.')
+        else:
+            block_ranges = [[0, len(blocks) - 1]] if blocks else []
+            new_doc.add_heading('Original Document Content with Highlights', level=2)
         new_doc.add_paragraph(
             'Sections highlighted in light yellow indicate parts that contained original comments. New comments have been added for clarity regarding these.')
         new_doc.add_paragraph(
             'Note: This tool cannot perfectly simulate Google Docs rendering. Always perform a manual review after conversion.')
         new_doc.add_paragraph('')
 
-        # Copy content, preserving formatting and highlighting comments
-        for block in doc.iter_inner_content():
-            if isinstance(block, type(doc.paragraphs[0])):  # Check if it's a paragraph
-                original_paragraph = block
-                new_paragraph = new_doc.add_paragraph()
-
-                # Copy paragraph style
-                if original_paragraph.style:
-                    try:
-                        new_paragraph.style = original_paragraph.style
-                    except KeyError:
-                        new_paragraph.style = new_doc.styles['Normal']  # Fallback to Normal if style not found
-
-                # Copy runs (text content with formatting)
-                for run in original_paragraph.runs:
-                    new_run = new_paragraph.add_run(run.text)
-                    new_run.bold = run.bold
-                    new_run.italic = run.italic
-                    new_run.underline = run.underline
-
-                    # Copy font color and size if present
-                    if run.font.color.rgb:
-                        new_run.font.color.rgb = run.font.color.rgb
-                    if run.font.size:
-                        new_run.font.size = run.font.size
-                    if run.font.name:
-                        new_run.font.name = run.font.name
-
-                    # Check for comments and highlight relevant paragraphs
-                    run_xml_str = run._element.xml
-                    for comment_id, comment_text in original_comments.items():
-                        if f'w:commentReference w:id="{comment_id}"' in run_xml_str:
-                            add_paragraph_background(new_paragraph, "FFFFCC")  # Light yellow background
-                            # Add new comment only once per paragraph
-                            if not hasattr(new_paragraph, '_comment_added_by_checker'):
-                                new_comment_content = f"Original Comment (ID: {comment_id}): {comment_text}"
-                                new_comment = new_doc.add_comment(text=new_comment_content,
-                                                                  author='Compatibility Checker', initials='CC')
-                                new_run_for_comment_ref = new_paragraph.add_run()
-                                new_run_for_comment_ref._element.append(new_comment._element)
-                                new_paragraph._comment_added_by_checker = True  # Mark paragraph as having comment added
-                            break
-
-            elif isinstance(block, type(doc.tables[0])):  # Check if it's a table
-                original_table = block
-                new_doc.add_paragraph('')  # Add a space before the table
-
-                # Create a new table and copy content
-                new_table = new_doc.add_table(rows=len(original_table.rows), cols=len(original_table.columns))
-                for r_idx, row in enumerate(original_table.rows):
-                    for c_idx, cell in enumerate(row.cells):
-                        new_cell = new_table.cell(r_idx, c_idx)
-                        # Clear default paragraph in new cell
-                        for p in list(new_cell.paragraphs):
-                            new_cell._element.remove(p._element)
-
-                        # Copy paragraphs and runs within each cell
-                        for para in cell.paragraphs:
-                            new_cell_para = new_cell.add_paragraph()
-                            if para.style:
-                                try:
-                                    new_cell_para.style = para.style
-                                except KeyError:
-                                    new_cell_para.style = new_doc.styles['Normal']
-
-                            for run in para.runs:
-                                new_run = new_cell_para.add_run(run.text)
-                                new_run.bold = run.bold
-                                new_run.italic = run.italic
-                                new_run.underline = run.underline
-                                if run.font.color.rgb:
-                                    new_run.font.color.rgb = run.font.color.rgb
-                                if run.font.size:
-                                    new_run.font.size = run.font.size
-                                if run.font.name:
-                                    new_run.font.name = run.font.name
-
-                new_doc.add_paragraph(
-                    'Note: Tables, especially with complex layouts or merged cells, can sometimes have display or formatting issues when converted to Google Docs. Review this table carefully in Google Docs.',
-                    style='Intense Quote')
-
-        # Save the new document to bytes and encode for response
+        # Copy content block by block at the XML level, then highlight paragraphs that carried comments
+        recreated_comments = set()
+        copier = WordBodyCopier(doc, new_doc)
+        total_blocks = sum(last - first + 1 for first, last in block_ranges)
+        copied_blocks = 0
+        for first, last in block_ranges:
+            if mode == 'compact':
+                new_doc.add_paragraph(compact_range_label(blocks, first, last, body_positions, flags),
+                                      style='Intense Quote')
+            for block in blocks[first:last + 1]:
+                if copied_blocks % 100 == 0:
+                    report_progress(progress, f'Block {copied_blocks + 1}/{total_blocks}', copied_blocks + 1,
+                                    total_blocks)
+                copied_blocks += 1
+                if block.tag == qn('w:tbl'):
+                    new_doc.add_paragraph('')  # Add a space before the table
+                clone = copier.copy(block)
+
+                if comment_index:
+                    # The copy has the same paragraphs in the same order as the source block
+                    for source_p, new_p in zip(block.iter(qn('w:p')), clone.iter(qn('w:p'))):
+                        comment_ids = comment_index.get(body_positions[source_p])
+                        if comment_ids:
+                            annotate_commented_paragraph(new_doc, Paragraph(new_p, new_doc._body), comment_ids,
+                                                         original_comments, recreated_comments)
+
+                if block.tag == qn('w:tbl'):
+                    new_doc.add_paragraph(
+                        'Note: Tables, especially with complex layouts or merged cells, can sometimes have display or formatting issues when converted to Google Docs. Review this table carefully in Google Docs.',
+                        style='Intense Quote')
+
+        report_progress(progress, 'Saving report', total_blocks, total_blocks)
+
+        # Save the new document to bytes for the report store
         output_bytes_io = io.BytesIO()
         new_doc.save(output_bytes_io)
-        output_bytes_encoded = base64.b64encode(output_bytes_io.getvalue()).decode('utf-8')
 
-        return True, output_bytes_encoded, issues_found
+        return True, output_bytes_io.getvalue(), issues_found
 
     except Exception as e:
         traceback.print_exc()
-        return False, "", [
+        return False, b"", [
             f"An unexpected error occurred during Word processing: {e}. Please ensure it's a valid .docx file."]
 
 
 # --- python-pptx imports and functions (for PowerPoint) ---
 from pptx import Presentation
-from pptx.util import Inches, Pt
+from pptx.util import Emu, Inches, Pt
 from pptx.enum.shapes import MSO_SHAPE
 from pptx.dml.color import RGBColor
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.parts.slide import SlideLayoutPart
+
+# Decks with at least PPTX_PARALLEL_MIN_SLIDES slides are analysed by PPTX_SLIDE_WORKERS processes.
+# The workers count toward the check's CHECK_MAX_RSS_MB memory budget. Batch members are analysed serially,
+# since the batch pool already runs one check per core.
+PPTX_PARALLEL_MIN_SLIDES = int(os.environ.get('PPTX_PARALLEL_MIN_SLIDES', 200))
+PPTX_SLIDE_WORKERS = int(os.environ.get('PPTX_SLIDE_WORKERS', min(4, os.cpu_count() or 1)))
+BLANK_LAYOUT_INDEX = 6  # "Blank" in python-pptx's default template
+PRESENTATION_NS = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+# Slide master and slide layout ids share one number space, starting at 2**31
+SLIDE_LAYOUT_MIN_ID = 2 ** 31
 
 
 def add_warning_textbox(slide, message):
@@ -210,98 +901,247 @@ def add_warning_textbox(slide, message):
     line.width = Pt(2)
 
 
-def check_powerpoint_google_slides_compatibility(input_file_base64, original_filename="presentation.pptx"):
+def package_has_part(prs, predicate):
+    """Returns True if any part of the presentation's package has a partname matching predicate."""
+    return any(predicate(str(part.partname)) for part in prs.part.package.iter_parts())
+
+
+class SlideLayoutResolver:
+    """
+    Resolves source slide layouts to report layouts by name, with one dict lookup per slide.
+    The report's own layouts are indexed once. A source layout with any other name is imported into
+    the report's slide master on first use, along with its images, and reused for later slides.
+    Layouts that cannot be imported (e.g. ones related to parts other than images) resolve to the blank layout.
+    """
+
+    def __init__(self, target_prs):
+        self.package = target_prs.part.package
+        self.master = target_prs.slide_masters[0]
+        self.blank = target_prs.slide_layouts[BLANK_LAYOUT_INDEX]
+        self.layouts = {}
+        for master in target_prs.slide_masters:
+            for layout in master.slide_layouts:
+                self.layouts.setdefault(layout.name, layout)
+        used_ids = [int(entry.get('id')) for part in [target_prs.part, *(m.part for m in target_prs.slide_masters)]
+                    for entry in part._element.iter(PRESENTATION_NS + 'sldMasterId', PRESENTATION_NS + 'sldLayoutId')]
+        self.next_id = max(used_ids + [SLIDE_LAYOUT_MIN_ID - 1]) + 1
+
+    def resolve(self, source_layout):
+        """Returns the report layout to use for a slide on source_layout."""
+        name = source_layout.name
+        if name not in self.layouts:
+            try:
+                self.layouts[name] = self._import(source_layout)
+            except Exception:
+                traceback.print_exc()
+                self.layouts[name] = self.blank
+        return self.layouts[name]
+
+    def _import(self, source_layout):
+        source_part = source_layout.part
+        element = copy.deepcopy(source_part._element)
+        layout_part = SlideLayoutPart(self.package.next_partname('/ppt/slideLayouts/slideLayout%d.xml'),
+                                      source_part.content_type, self.package, element)
+        rel_ids = {}
+        for rel_id, rel in source_part.rels.items():
+            if rel.reltype == RT.SLIDE_MASTER:
+                rel_ids[rel_id] = layout_part.relate_to(self.master.part, RT.SLIDE_MASTER)
+            elif rel.is_external:
+                rel_ids[rel_id] = layout_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            elif rel.reltype == RT.IMAGE:
+                _, rel_ids[rel_id] = layout_part.get_or_add_image_part(io.BytesIO(rel.target_part.blob))
+            else:
+                raise ValueError(f'Layout {source_layout.name!r} has a {rel.reltype} relationship')
+        for child in element.iter():
+            for attribute, value in child.attrib.items():
+                if attribute.startswith(RELATIONSHIPS_NS) and value in rel_ids:
+                    child.set(attribute, rel_ids[value])
+
+        entry = self.master._element.get_or_add_sldLayoutIdLst()._add_sldLayoutId()
+        entry.set('id', str(self.next_id))
+        entry.rId = self.master.part.relate_to(layout_part, RT.SLIDE_LAYOUT)
+        self.next_id += 1
+        return layout_part.slide_layout
+
+
+def emu_or_none(length):
+    """Returns a python-pptx length as a plain int of EMU, or None."""
+    return None if length is None else int(length)
+
+
+def analyse_slide(slide, slide_idx, build_report):
+    """
+    Detects the issues of one slide and, if build_report is set, reads the text frames and speaker notes
+    the report copies from it. Returns plain data that can be sent back from a worker process:
+    {'issues': [...], 'text_frames': [(left, top, width, height, word_wrap, [paragraph tuples])], 'notes': text or None},
+    with lengths and font sizes as ints of EMU.
+    """
+    issues = []
+    text_frames = []
+    notes = None
+    for shape in slide.shapes:
+        try:
+            if shape.has_text_frame:
+                if not build_report:
+                    continue
+                # Lengths are sent as plain EMU ints: python-pptx Length subclasses such as Centipoints
+                # rescale their value again when unpickled
+                paragraphs = [(paragraph.text, paragraph.font.bold, paragraph.font.italic, paragraph.font.underline,
+                               emu_or_none(paragraph.font.size), paragraph.font.name, paragraph.alignment)
+                              for paragraph in shape.text_frame.paragraphs]
+                text_frames.append((emu_or_none(shape.left), emu_or_none(shape.top), emu_or_none(shape.width),
+                                    emu_or_none(shape.height), shape.text_frame.word_wrap, paragraphs))
+            elif shape.shape_type == MSO_SHAPE.PICTURE:
+                issues.append(
+                    f'Slide {slide_idx + 1}: Contains an embedded picture. Image quality or specific effects might differ.')
+            elif not shape.has_text_frame and shape.shape_type != MSO_SHAPE.PICTURE:
+                issues.append(
+                    f'Slide {slide_idx + 1}: Contains complex graphics or non-standard shapes. Fidelity might be lost upon conversion.')
+
+        except Exception as e:
+            print(f"Error copying shape on slide {slide_idx + 1}: {e}")
+            issues.append(
+                f'Slide {slide_idx + 1}: Could not fully copy a shape due to an internal error ({e}). Review this slide carefully.')
+
+    # Check for speaker notes
+    if slide.has_notes_slide:
+        notes_text = slide.notes_slide.notes_text_frame.text
+        if notes_text.strip():
+            issues.append(
+                f'Slide {slide_idx + 1}: Contains speaker notes. While Google Slides supports notes, their formatting or exact display might differ.')
+            notes = notes_text.strip()
+    return {'issues': issues, 'text_frames': text_frames, 'notes': notes}
+
+
+def add_text_frames(slide, text_frames):
+    """Re-creates text frames read by analyse_slide() as textboxes on a report slide, with basic font formatting."""
+    for left, top, width, height, word_wrap, paragraphs in text_frames:
+        new_textbox = slide.shapes.add_textbox(*(None if length is None else Emu(length)
+                                                 for length in (left, top, width, height)))
+        new_text_frame = new_textbox.text_frame
+        new_text_frame.word_wrap = word_wrap
+        for text, bold, italic, underline, size, name, alignment in paragraphs:
+            new_paragraph = new_text_frame.add_paragraph()
+            new_paragraph.text = text
+            if bold: new_paragraph.font.bold = True
+            if italic: new_paragraph.font.italic = True
+            if underline: new_paragraph.font.underline = True
+            if size: new_paragraph.font.size = Emu(size)
+            if name: new_paragraph.font.name = name
+            if alignment: new_paragraph.alignment = alignment
+
+
+_slide_worker_prs = None  # The presentation a slide worker process analyses, inherited from its parent
+
+
+def _init_slide_worker(prs):
+    global _slide_worker_prs
+    _slide_worker_prs = prs
+
+
+def analyse_slide_range(start, stop, build_report):
+    """Slide worker task: returns analyse_slide() results for slides start to stop - 1."""
+    slides = list(_slide_worker_prs.slides)
+    return [analyse_slide(slides[slide_idx], slide_idx, build_report) for slide_idx in range(start, stop)]
+
+
+def analyse_slides(prs, build_report, progress=None, workers=None):
+    """
+    Returns analyse_slide() results for every slide of prs, in slide order. Decks of PPTX_PARALLEL_MIN_SLIDES
+    slides or more are split into ranges analysed by up to workers (default PPTX_SLIDE_WORKERS) forked
+    processes, which inherit the already opened presentation instead of parsing the package again.
+    """
+    workers = PPTX_SLIDE_WORKERS if workers is None else workers
+    slides = list(prs.slides)
+    total_slides = len(slides)
+    if total_slides < PPTX_PARALLEL_MIN_SLIDES or workers <= 1:
+        results = []
+        for slide_idx, slide in enumerate(slides):
+            report_progress(progress, f'Slide {slide_idx + 1}/{total_slides}', slide_idx + 1, total_slides)
+            results.append(analyse_slide(slide, slide_idx, build_report))
+        return results
+
+    # A few ranges per worker balance slow slides across workers and keep progress events coming
+    range_size = -(-total_slides // (workers * 4))
+    results = [None] * total_slides
+    analysed = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+                             initializer=_init_slide_worker, initargs=(prs,)) as executor:
+        futures = {executor.submit(analyse_slide_range, start, min(start + range_size, total_slides), build_report):
+                   start for start in range(0, total_slides, range_size)}
+        for future in as_completed(futures):
+            range_results = future.result()
+            start = futures[future]
+            results[start:start + len(range_results)] = range_results
+            analysed += len(range_results)
+            report_progress(progress, f'Slide {analysed}/{total_slides}', analysed, total_slides)
+    return results
+
+
+def check_powerpoint_google_slides_compatibility(input_file, original_filename="presentation.pptx", mode="report",
+                                                 progress=None, slide_workers=None):
     """
     Checks a PowerPoint presentation for compatibility issues when converting to Google Slides
     and generates a report.
+    input_file may be a base64 string, raw bytes or a binary file object.
+    In mode="scan" only the issues are detected and no report presentation is built (output is None).
+    Large decks are analysed in up to slide_workers (default PPTX_SLIDE_WORKERS) parallel worker processes;
+    see analyse_slides().
+    progress, if given, is called with progress events as slides are analysed.
     """
     try:
-        decoded_bytes = base64.b64decode(input_file_base64)
-        pptx_bytes_io = io.BytesIO(decoded_bytes)
-        prs = Presentation(pptx_bytes_io)
-
-        new_prs = Presentation()
-        new_prs.slide_width = prs.slide_width
-        new_prs.slide_height = prs.slide_height
+        prs = Presentation(open_input_file(input_file))
+        build_report = mode != 'scan'
 
         issues_found = []
 
-        # Create summary slide
-        summary_slide_layout = new_prs.slide_layouts[0]  # Title slide layout
-        summary_slide = new_prs.slides.add_slide(summary_slide_layout)
-        title = summary_slide.shapes.title
-        title.text = "Google Slides Compatibility Report"
-        subtitle = summary_slide.placeholders[1]
-        subtitle.text = f"For: {original_filename}"
+        if build_report:
+            new_prs = Presentation()
+            new_prs.slide_width = prs.slide_width
+            new_prs.slide_height = prs.slide_height
 
-        summary_body = summary_slide.shapes.add_textbox(Inches(0.5), Inches(2), Inches(9), Inches(5)).text_frame
-        summary_body.word_wrap = True
-        summary_body.add_paragraph().text = "This report highlights potential compatibility issues when converting this presentation to Google Slides. Features like VBA macros, complex animations, specific fonts, and embedded objects might render differently or not at all."
-        summary_body.add_paragraph().text = ""
+            # Create summary slide
+            summary_slide_layout = new_prs.slide_layouts[0]  # Title slide layout
+            summary_slide = new_prs.slides.add_slide(summary_slide_layout)
+            title = summary_slide.shapes.title
+            title.text = "Google Slides Compatibility Report"
+            subtitle = summary_slide.placeholders[1]
+            subtitle.text = f"For: {original_filename}"
 
-        # Check for VBA Macros
-        if prs.has_macros:
+            summary_body = summary_slide.shapes.add_textbox(Inches(0.5), Inches(2), Inches(9), Inches(5)).text_frame
+            summary_body.word_wrap = True
+            summary_body.add_paragraph().text = "This report highlights potential compatibility issues when converting this presentation to Google Slides. Features like VBA macros, complex animations, specific fonts, and embedded objects might render differently or not at all."
+            summary_body.add_paragraph().text = ""
+
+            layouts = SlideLayoutResolver(new_prs)
+
+        # Check for VBA Macros (python-pptx has no macro API; a .pptm carries its project in vbaProject.bin)
+        if package_has_part(prs, lambda partname: partname.endswith('/vbaProject.bin')):
             issues_found.append(
                 'VBA Macros: This presentation contains VBA macros, which are not supported in Google Slides and will be lost upon conversion. Consider converting macro functionality to Google Apps Script if needed.')
 
-        # Iterate through slides and copy content
-        for slide_idx, slide in enumerate(prs.slides):
-            try:
-                # Try to match layout, fallback to blank layout
-                layout = next((l for l in new_prs.slide_layouts if l.name == slide.slide_layout.name),
-                              new_prs.slide_layouts[6])  # 6 is blank layout
-                new_slide = new_prs.slides.add_slide(layout)
-            except Exception:
-                new_slide = new_prs.slides.add_slide(new_prs.slide_layouts[6])  # Fallback if layout fails
-
-            # Copy shapes and identify potential issues
-            for shape in slide.shapes:
-                try:
-                    if shape.has_text_frame:
-                        new_textbox = new_slide.shapes.add_textbox(shape.left, shape.top, shape.width, shape.height)
-                        new_text_frame = new_textbox.text_frame
-                        new_text_frame.word_wrap = shape.text_frame.word_wrap
-                        for paragraph in shape.text_frame.paragraphs:
-                            new_paragraph = new_text_frame.add_paragraph()
-                            new_paragraph.text = paragraph.text
-                            # Copy basic font formatting
-                            if paragraph.font.bold: new_paragraph.font.bold = True
-                            if paragraph.font.italic: new_paragraph.font.italic = True
-                            if paragraph.font.underline: new_paragraph.font.underline = True
-                            if paragraph.font.size: new_paragraph.font.size = paragraph.font.size
-                            if paragraph.font.name: new_paragraph.font.name = paragraph.font.name
-                            if paragraph.alignment: new_paragraph.alignment = paragraph.alignment
-
-                    elif shape.shape_type == MSO_SHAPE.PICTURE:
-                        issues_found.append(
-                            f'Slide {slide_idx + 1}: Contains an embedded picture. Image quality or specific effects might differ.')
-                    elif not shape.has_text_frame and shape.shape_type != MSO_SHAPE.PICTURE:
-                        issues_found.append(
-                            f'Slide {slide_idx + 1}: Contains complex graphics or non-standard shapes. Fidelity might be lost upon conversion.')
-
-                except Exception as e:
-                    print(f"Error copying shape on slide {slide_idx + 1}: {e}")
-                    issues_found.append(
-                        f'Slide {slide_idx + 1}: Could not fully copy a shape due to an internal error ({e}). Review this slide carefully.')
-
-            # Check for speaker notes
-            if slide.has_notes_slide:
-                notes_text = slide.notes_slide.notes_text_frame.text
-                if notes_text.strip():
-                    issues_found.append(
-                        f'Slide {slide_idx + 1}: Contains speaker notes. While Google Slides supports notes, their formatting or exact display might differ.')
-                    add_warning_textbox(new_slide, f"Original Speaker Notes: {notes_text.strip()[:100]}...")
-
-        # Check for comments in the presentation (overall)
-        if prs.comments:  # pptx.Presentation object might not have a direct .comments attribute for collection
-            # This check might be more granular per shape or slide if pptx supports it better.
-            # Assuming this checks for some top-level comment presence.
+        # Analyse the slides, in parallel for large decks, then copy their content in slide order
+        slide_results = analyse_slides(prs, build_report, progress, slide_workers)
+        for slide, result in zip(prs.slides, slide_results):
+            issues_found.extend(result['issues'])
+            if build_report:
+                new_slide = new_prs.slides.add_slide(layouts.resolve(slide.slide_layout))
+                add_text_frames(new_slide, result['text_frames'])
+                if result['notes']:
+                    add_warning_textbox(new_slide, f"Original Speaker Notes: {result['notes'][:100]}...")
+
+        # Check for comments in the presentation (overall). python-pptx has no comments API, so look for
+        # legacy (ppt/comments/commentN.xml) and modern (ppt/comments/modernComment_*.xml) comment parts.
+        if package_has_part(prs, lambda partname: partname.startswith('/ppt/comments/')):
             issues_found.append(
                 'Comments: This presentation contains comments. While Google Slides supports comments, their appearance and exact positioning might differ after conversion.')
 
         # Ensure unique issues for final summary display
         issues_found = list(set(issues_found))
 
+        if not build_report:
+            return True, None, issues_found
+
         # Add issues summary to the report slide
         if issues_found:
             summary_body.add_paragraph().text = "Summary of Potential Issues:"
@@ -311,16 +1151,15 @@ def check_powerpoint_google_slides_compatibility(input_file_base64, original_fil
         else:
             summary_body.add_paragraph().text = 'No major compatibility issues (like macros or extensive comments/notes) were automatically detected. However, always review the converted presentation in Google Slides for layout, animation, and formatting fidelity.'
 
-        # Save the new presentation to bytes and encode for response
+        # Save the new presentation to bytes for the report store
         output_bytes_io = io.BytesIO()
         new_prs.save(output_bytes_io)
-        output_bytes_encoded = base64.b64encode(output_bytes_io.getvalue()).decode('utf-8')
 
-        return True, output_bytes_encoded, issues_found
+        return True, output_bytes_io.getvalue(), issues_found
 
     except Exception as e:
         traceback.print_exc()
-        return False, "", [
+        return False, b"", [
             f"An unexpected error occurred during PowerPoint processing: {e}. Please ensure it's a valid .pptx file."]
 
 
@@ -332,6 +1171,27 @@ from openpyxl.utils import get_column_letter, column_index_from_string
 from openpyxl.styles.colors import Color  # <--- ADDED: Explicit import for Color object
 
 
+# Workbook-level issue messages, shared by the full checker and the streaming scanner
+EXCEL_ISSUES = {
+    'macros': (
+        'VBA Macros: This workbook contains VBA macros, which are not supported in Google Sheets and will be lost upon conversion. Consider converting macro functionality to Google Apps Script if needed.'),
+    'charts': (
+        'Charts/Complex Graphics: This workbook might contain charts or complex graphic objects. Their appearance, data links, and interactivity might differ significantly or be lost upon conversion.'),
+    'images': (
+        'Embedded Images/Shapes: This workbook might contain embedded images or drawing shapes. Their positioning, scaling, and specific effects might differ upon conversion.'),
+    'conditional_formatting': (
+        'Conditional Formatting: Some sheets contain conditional formatting rules. Review them carefully after conversion.'),
+    'data_validation': (
+        'Data Validation: Some sheets contain data validation rules. Verify their functionality after conversion.'),
+    'comments': (
+        'Comments: Some cells contain comments. While Google Sheets supports comments, their appearance and exact positioning might differ.'),
+    'formulas': (
+        'Formulas: This workbook contains formulas. Most common functions transfer, but complex array formulas or Excel-specific functions might break. Review formulas after conversion.'),
+    'merged_cells': (
+        'Merged Cells: This workbook contains merged cells. While Google Sheets supports merging, visual layout might differ subtly.'),
+}
+
+
 # Helper function for adding fill to a cell
 def add_fill_to_cell(cell, hex_color):
     """Adds a solid background fill to a cell using openpyxl.styles.PatternFill."""
@@ -346,49 +1206,52 @@ def add_border_to_cell(cell, color="000000", style="thin"):
     cell.border = Border(left=side, right=side, top=side, bottom=side)
 
 
-def check_excel_google_sheets_compatibility(input_file_base64, original_filename="document.xlsx"):
+def check_excel_google_sheets_compatibility(input_file, original_filename="document.xlsx", mode="report",
+                                            progress=None):
     """
     Checks an Excel workbook for compatibility issues when converting to Google Sheets
     and generates a report.
+    input_file may be a base64 string, raw bytes or a binary file object.
+    In mode="scan" only the issues are detected and no report workbook is built (output is None).
+    progress, if given, is called with a progress event per sheet and every 5,000 rows.
     """
     try:
-        decoded_bytes = base64.b64decode(input_file_base64)
-        excel_bytes_io = io.BytesIO(decoded_bytes)
-
-        original_wb = load_workbook(excel_bytes_io, keep_vba=True)
-        report_wb = Workbook()
+        original_wb = load_workbook(open_input_file(input_file), keep_vba=True)
+        build_report = mode != 'scan'
 
         issues_found = []
 
-        summary_ws = report_wb.active
-        summary_ws.title = "Compatibility Report"
+        if build_report:
+            report_wb = Workbook()
+            summary_ws = report_wb.active
+            summary_ws.title = "Compatibility Report"
 
-        # Set up the summary section on the first sheet
-        summary_ws['A1'] = "Google Sheets Compatibility Report"
-        summary_ws['A1'].font = Font(bold=True, size=16)
-        summary_ws['A2'] = f"Original File: {original_filename}"
-        summary_ws[
-            'A3'] = "This report highlights potential compatibility issues when converting this Excel workbook to Google Sheets."
-        summary_ws[
-            'A4'] = "Features like VBA macros, complex formulas, certain charts/shapes, and specific formatting might render differently or not at all."
+            # Set up the summary section on the first sheet
+            summary_ws['A1'] = "Google Sheets Compatibility Report"
+            summary_ws['A1'].font = Font(bold=True, size=16)
+            summary_ws['A2'] = f"Original File: {original_filename}"
+            summary_ws[
+                'A3'] = "This report highlights potential compatibility issues when converting this Excel workbook to Google Sheets."
+            summary_ws[
+                'A4'] = "Features like VBA macros, complex formulas, certain charts/shapes, and specific formatting might render differently or not at all."
 
         summary_row = 6  # Starting row for the issues summary list
 
         # Check for VBA Macros
         if original_wb.vba_archive is not None:
-            issues_found.append(
-                'VBA Macros: This workbook contains VBA macros, which are not supported in Google Sheets and will be lost upon conversion. Consider converting macro functionality to Google Apps Script if needed.')
+            issues_found.append(EXCEL_ISSUES['macros'])
 
         # General warnings for elements openpyxl might not fully parse or are known conversion issues
-        issues_found.append(
-            'Charts/Complex Graphics: This workbook might contain charts or complex graphic objects. Their appearance, data links, and interactivity might differ significantly or be lost upon conversion.')
-        issues_found.append(
-            'Embedded Images/Shapes: This workbook might contain embedded images or drawing shapes. Their positioning, scaling, and specific effects might differ upon conversion.')
+        issues_found.append(EXCEL_ISSUES['charts'])
+        issues_found.append(EXCEL_ISSUES['images'])
 
         # Iterate through each sheet in the original workbook
-        for sheet_name in original_wb.sheetnames:
+        total_sheets = len(original_wb.sheetnames)
+        for sheet_idx, sheet_name in enumerate(original_wb.sheetnames):
             original_ws = original_wb[sheet_name]
-            report_ws = report_wb.create_sheet(title=sheet_name)  # Create a new sheet for the report
+            report_progress(progress, f'Sheet {sheet_idx + 1}/{total_sheets}', sheet_idx + 1, total_sheets)
+            if build_report:
+                report_ws = report_wb.create_sheet(title=sheet_name)  # Create a new sheet for the report
 
             sheet_specific_warnings = []
 
@@ -397,18 +1260,16 @@ def check_excel_google_sheets_compatibility(input_file_base64, original_filename
                 sheet_specific_warnings.append(
                     'Conditional Formatting: This sheet uses conditional formatting. While Google Sheets supports some rules, complex or custom rules might not translate perfectly.')
                 if not any("Conditional Formatting" in issue for issue in issues_found):
-                    issues_found.append(
-                        'Conditional Formatting: Some sheets contain conditional formatting rules. Review them carefully after conversion.')
+                    issues_found.append(EXCEL_ISSUES['conditional_formatting'])
 
             if original_ws.data_validations:
                 sheet_specific_warnings.append(
                     'Data Validation: This sheet uses data validation. Simple rules usually transfer, but custom formulas or complex lists might not.')
                 if not any("Data Validation" in issue for issue in issues_found):
-                    issues_found.append(
-                        'Data Validation: Some sheets contain data validation rules. Verify their functionality after conversion.')
+                    issues_found.append(EXCEL_ISSUES['data_validation'])
 
             # Add sheet-specific warnings to the report sheet
-            if sheet_specific_warnings:
+            if build_report and sheet_specific_warnings:
                 # Insert rows at the top for warnings
                 for _ in range(len(sheet_specific_warnings) + 1):
                     report_ws.insert_rows(1)
@@ -431,99 +1292,108 @@ def check_excel_google_sheets_compatibility(input_file_base64, original_filename
             # Copy cell data and formatting
             for row_idx, row in enumerate(original_ws.iter_rows()):
                 target_row_idx = row_idx + 1 + row_offset
+                if row_idx and row_idx % 5000 == 0:
+                    report_progress(progress,
+                                    f'Sheet {sheet_idx + 1}/{total_sheets}, rows {row_idx}/{original_ws.max_row}',
+                                    sheet_idx + 1, total_sheets)
 
                 # Copy row height
-                if row_idx + 1 in original_ws.row_dimensions:
+                if build_report and row_idx + 1 in original_ws.row_dimensions:
                     report_ws.row_dimensions[target_row_idx].height = original_ws.row_dimensions[row_idx + 1].height
 
                 for col_idx, cell in enumerate(row):
-                    target_col_letter = get_column_letter(col_idx + 1)
-                    report_cell = report_ws[f'{target_col_letter}{target_row_idx}']
-
-                    report_cell.value = cell.value  # Copy cell value
-
-                    # Copy cell styles (font, fill, alignment, border)
-                    if cell.has_style:
-                        if cell.font:
-                            font_color_value = None
-                            if cell.font.color:
-                                try:
-                                    # Safely extract RGB hex string for openpyxl Font color
-                                    if isinstance(cell.font.color, Color) and cell.font.color.rgb and len(
-                                            cell.font.color.rgb) in [6, 8]:
-                                        font_color_value = cell.font.color.rgb
-                                    # Fallback for unexpected color types (e.g., from pptx if mixed up, though unlikely here)
-                                    elif hasattr(cell.font.color, 'rgb') and hasattr(cell.font.color.rgb, 'r'):
-                                        rgb = cell.font.color.rgb
-                                        font_color_value = f"{rgb.r:02X}{rgb.g:02X}{rgb.b:02X}"
-                                except Exception:
-                                    font_color_value = '000000'  # Default to black if conversion fails
-
-                            report_cell.font = Font(name=cell.font.name, size=cell.font.size,
-                                                    bold=cell.font.bold, italic=cell.font.italic,
-                                                    underline=cell.font.underline, strike=cell.font.strike,
-                                                    color=font_color_value)  # Use the extracted hex string or None
-                        if cell.fill:
-                            # openpyxl fill colors also expect hex strings.
-                            report_cell.fill = PatternFill(start_color=cell.fill.start_color,
-                                                           end_color=cell.fill.end_color, fill_type=cell.fill.fill_type)
-                        if cell.alignment:
-                            report_cell.alignment = Alignment(horizontal=cell.alignment.horizontal,
-                                                              vertical=cell.alignment.vertical,
-                                                              wrap_text=cell.alignment.wrap_text,
-                                                              shrink_to_fit=cell.alignment.shrink_to_fit,
-                                                              indent=cell.alignment.indent,
-                                                              text_rotation=cell.alignment.text_rotation,
-                                                              readingOrder=cell.alignment.readingOrder)
-                        if cell.border:
-                            # openpyxl border colors also expect hex strings.
-                            report_cell.border = Border(left=cell.border.left, right=cell.border.right,
-                                                        top=cell.border.top, bottom=cell.border.bottom,
-                                                        diagonalUp=cell.border.diagonalUp,
-                                                        diagonalDown=cell.border.diagonalDown,
-                                                        outline=cell.border.outline)
-
-                    # Copy column width
-                    if col_idx + 1 in original_ws.column_dimensions:
-                        report_ws.column_dimensions[target_col_letter].width = original_ws.column_dimensions[
-                            get_column_letter(col_idx + 1)].width
+                    if build_report:
+                        target_col_letter = get_column_letter(col_idx + 1)
+                        report_cell = report_ws[f'{target_col_letter}{target_row_idx}']
+
+                        report_cell.value = cell.value  # Copy cell value
+
+                        # Copy cell styles (font, fill, alignment, border)
+                        if cell.has_style:
+                            if cell.font:
+                                font_color_value = None
+                                if cell.font.color:
+                                    try:
+                                        # Safely extract RGB hex string for openpyxl Font color
+                                        if isinstance(cell.font.color, Color) and cell.font.color.rgb and len(
+                                                cell.font.color.rgb) in [6, 8]:
+                                            font_color_value = cell.font.color.rgb
+                                        # Fallback for unexpected color types (e.g., from pptx if mixed up, though unlikely here)
+                                        elif hasattr(cell.font.color, 'rgb') and hasattr(cell.font.color.rgb, 'r'):
+                                            rgb = cell.font.color.rgb
+                                            font_color_value = f"{rgb.r:02X}{rgb.g:02X}{rgb.b:02X}"
+                                    except Exception:
+                                        font_color_value = '000000'  # Default to black if conversion fails
+
+                                report_cell.font = Font(name=cell.font.name, size=cell.font.size,
+                                                        bold=cell.font.bold, italic=cell.font.italic,
+                                                        underline=cell.font.underline, strike=cell.font.strike,
+                                                        color=font_color_value)  # Use the extracted hex string or None
+                            if cell.fill:
+                                # openpyxl fill colors also expect hex strings.
+                                report_cell.fill = PatternFill(start_color=cell.fill.start_color,
+                                                               end_color=cell.fill.end_color, fill_type=cell.fill.fill_type)
+                            if cell.alignment:
+                                report_cell.alignment = Alignment(horizontal=cell.alignment.horizontal,
+                                                                  vertical=cell.alignment.vertical,
+                                                                  wrap_text=cell.alignment.wrap_text,
+                                                                  shrink_to_fit=cell.alignment.shrink_to_fit,
+                                                                  indent=cell.alignment.indent,
+                                                                  text_rotation=cell.alignment.text_rotation,
+                                                                  readingOrder=cell.alignment.readingOrder)
+                            if cell.border:
+                                # openpyxl border colors also expect hex strings.
+                                report_cell.border = Border(left=cell.border.left, right=cell.border.right,
+                                                            top=cell.border.top, bottom=cell.border.bottom,
+                                                            diagonalUp=cell.border.diagonalUp,
+                                                            diagonalDown=cell.border.diagonalDown,
+                                                            outline=cell.border.outline)
+
+                        # Copy column width
+                        if col_idx + 1 in original_ws.column_dimensions:
+                            report_ws.column_dimensions[target_col_letter].width = original_ws.column_dimensions[
+                                get_column_letter(col_idx + 1)].width
 
                     # Check for cell comments
                     if cell.comment:
-                        add_fill_to_cell(report_cell, "FFFFCC")  # Highlight cells with comments
-                        report_cell.comment = Comment(f"Original Comment: {cell.comment.text}", "Compatibility Checker")
+                        if build_report:
+                            add_fill_to_cell(report_cell, "FFFFCC")  # Highlight cells with comments
+                            report_cell.comment = Comment(f"Original Comment: {cell.comment.text}",
+                                                          "Compatibility Checker")
                         if not any("Comments" in issue for issue in issues_found):
-                            issues_found.append(
-                                'Comments: Some cells contain comments. While Google Sheets supports comments, their appearance and exact positioning might differ.')
+                            issues_found.append(EXCEL_ISSUES['comments'])
 
                     # Check for formulas
                     if cell.data_type == 'f':  # 'f' denotes a formula cell
-                        add_fill_to_cell(report_cell, "FFFFCC")  # Highlight formulas
+                        if build_report:
+                            add_fill_to_cell(report_cell, "FFFFCC")  # Highlight formulas
                         if not any("Formulas" in issue for issue in issues_found):
-                            issues_found.append(
-                                'Formulas: This workbook contains formulas. Most common functions transfer, but complex array formulas or Excel-specific functions might break. Review formulas after conversion.')
+                            issues_found.append(EXCEL_ISSUES['formulas'])
 
             # Handle merged cells
             for merged_range_obj in original_ws.merged_cells.ranges:
-                start_col = merged_range_obj.min_col
-                start_row = merged_range_obj.min_row
-                end_col = merged_range_obj.max_col
-                end_row = merged_range_obj.max_row
+                if build_report:
+                    start_col = merged_range_obj.min_col
+                    start_row = merged_range_obj.min_row
+                    end_col = merged_range_obj.max_col
+                    end_row = merged_range_obj.max_row
 
-                # Adjust merged cell range for row offset
-                new_start_row = start_row + row_offset
-                new_end_row = end_row + row_offset
+                    # Adjust merged cell range for row offset
+                    new_start_row = start_row + row_offset
+                    new_end_row = end_row + row_offset
 
-                new_merge_range = f"{get_column_letter(start_col)}{new_start_row}:{get_column_letter(end_col)}{new_end_row}"
-                report_ws.merge_cells(new_merge_range)
+                    new_merge_range = f"{get_column_letter(start_col)}{new_start_row}:{get_column_letter(end_col)}{new_end_row}"
+                    report_ws.merge_cells(new_merge_range)
 
-                # Highlight the top-left cell of the merged range
-                top_left_cell_in_report = report_ws[f"{get_column_letter(start_col)}{new_start_row}"]
-                add_fill_to_cell(top_left_cell_in_report, "FFFFCC")  # Highlight merged cells
+                    # Highlight the top-left cell of the merged range
+                    top_left_cell_in_report = report_ws[f"{get_column_letter(start_col)}{new_start_row}"]
+                    add_fill_to_cell(top_left_cell_in_report, "FFFFCC")  # Highlight merged cells
 
                 if not any("Merged Cells" in issue for issue in issues_found):
-                    issues_found.append(
-                        'Merged Cells: This workbook contains merged cells. While Google Sheets supports merging, visual layout might differ subtly.')
+                    issues_found.append(EXCEL_ISSUES['merged_cells'])
+
+        if not build_report:
+            return True, None, list(set(issues_found))
 
         # Final summary on the first sheet
         summary_ws['A' + str(summary_row)].value = "Summary of Potential Issues:"
@@ -542,23 +1412,1693 @@ def check_excel_google_sheets_compatibility(input_file_base64, original_filename
             summary_ws['A' + str(summary_row)].font = Font(italic=True,
                                                            color=Color(rgb="646464"))  # Grey italic for no issues
 
-        # Save the new workbook to bytes and encode for response
+        # Save the new workbook to bytes for the report store
         output_bytes_io = io.BytesIO()
         report_wb.save(output_bytes_io)
-        output_bytes_encoded = base64.b64encode(output_bytes_io.getvalue()).decode('utf-8')
 
-        return True, output_bytes_encoded, issues_found
+        return True, output_bytes_io.getvalue(), issues_found
+
+    except Exception as e:
+        traceback.print_exc()
+        return False, b"", [
+            f"An unexpected error occurred during Excel processing: {e}. Please ensure it's a valid .xlsx or .xlsm file. Details: {str(e)}"]
+
+
+# Checker dispatch by file type
+CHECKERS = {
+    'docx': check_word_google_docs_compatibility,
+    'pptx': check_powerpoint_google_slides_compatibility,
+    'xlsx': check_excel_google_sheets_compatibility,
+    'xlsm': check_excel_google_sheets_compatibility,
+}
+
+
+# Options accepted by every checker, with their allowed values.
+# mode="compact" builds a flagged-only report for Word; the other checkers treat it like "report".
+CHECK_OPTIONS = {
+    'mode': ('report', 'compact', 'scan'),
+}
+
+
+def run_check(file_type, input_file, filename, progress=None, **options):
+    """
+    Runs the checker for file_type in an isolated child process and returns its (success, output_bytes, issues) tuple.
+    options are passed through to the checker (see CHECK_OPTIONS); output_bytes is None in scan mode.
+    progress is an optional callback receiving {'message', 'current', 'total'} progress events; it is
+    called from the child process.
+    The package is screened by guard_package first and oversized packages run the type's streaming scanner.
+    Word packages have their parts hashed and cached part findings fetched here, before the child is forked.
+    Raises ValueError for unsupported file types, PackageRejected if the package exceeds the size limits
+    and BudgetExceeded if the check runs out of time or memory.
+    """
+    checker = CHECKERS.get(file_type)
+    if checker is None:
+        raise ValueError('Unsupported file type provided.')
+    input_file = open_input_file(input_file)
+    if guard_package(input_file) == 'stream':
+        checker = STREAMING_CHECKERS.get(file_type)
+        if checker is None:
+            raise PackageRejected('streaming', f'The file holds more than {PACKAGE_STREAM_XML_MB} MB of XML, '
+                                               f'which is too large to check.')
+    check_cache = CheckCache(*prefetch_word_part_findings(input_file)) if file_type == 'docx' else None
+    return run_isolated(checker, input_file, filename, progress=progress, check_cache=check_cache, **options)
+
+
+# --- Isolated execution ---
+# Every check runs in a forked child process with a wall-clock deadline and a resident-memory ceiling.
+# A pathological document is killed without touching the web worker or any other request.
+# 0 disables a limit. The memory ceiling is read from /proc and so is only enforced on Linux.
+# The child is forked from a multi-threaded web worker, and a lock another thread held at that moment stays held
+# forever in the child. The check must therefore not touch lock-protected state: it gets the cache entries it
+# needs from the supervisor (see CheckCache), result_cache and admission are replaced by ForkedStateGuard
+# stand-ins, and the standard streams and the shared lxml parsers of python-docx and python-pptx are renewed.
+CHECK_TIMEOUT_SECONDS = float(os.environ.get('CHECK_TIMEOUT_SECONDS', 120))
+CHECK_MAX_RSS_MB = int(os.environ.get('CHECK_MAX_RSS_MB', 1024))
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class BudgetExceeded(Exception):
+    """Raised when an isolated check is cancelled for exceeding its time ('time') or memory ('memory') budget."""
+
+    def __init__(self, budget, limit, message):
+        super().__init__(message)
+        self.budget = budget
+        self.limit = limit
+
+    def to_dict(self):
+        """Returns the structured error fields for a JSON response."""
+        return {'success': False, 'error': str(self), 'error_code': 'budget_exceeded',
+                'budget': self.budget, 'limit': self.limit}
+
+
+def process_children(pid):
+    """Returns the ids of the child processes of pid, or [] where the kernel does not list them."""
+    children = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children += [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        pass
+    return children
+
+
+def process_pss_bytes(pid):
+    """Returns the proportional set size of process pid in bytes (shared pages split between their users), or 0."""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def child_rss_bytes(pid):
+    """
+    Returns the resident memory of process pid and any worker processes it started, in bytes, or None
+    where /proc is unavailable. A lone process is measured by its resident set size. Forked workers share
+    most of their pages with the process that started them, so a process tree is measured by the sum
+    of its proportional set sizes instead, which counts every shared page once.
+    """
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            rss = int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+    tree = [pid]
+    for process_id in tree:
+        tree += process_children(process_id)
+    if len(tree) == 1:
+        return rss
+    return sum(process_pss_bytes(process_id) for process_id in tree) or rss
+
+
+def _watch_supervisor(supervisor_pid, interval=0.5):
+    """
+    Child process watchdog thread: the child leaves its supervisor's process group, so it would outlive a
+    killed web worker with no deadline or memory ceiling. Kills the child's whole process group once its
+    parent is no longer the supervising process.
+    """
+    while True:
+        time.sleep(interval)
+        if os.getppid() != supervisor_pid:
+            os.killpg(0, signal.SIGKILL)
+
+
+class ForkedStateGuard:
+    """Stands in for a lock-protected object inside an isolated check process; any use raises RuntimeError."""
 
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        raise RuntimeError(f'{self.name} must not be used inside an isolated check process; '
+                           f'the supervisor has to do it before or after run_isolated().')
+
+
+def _renew_xml_parsers():
+    """
+    Replaces the module-level lxml parsers of python-docx and python-pptx with fresh ones using the same
+    element classes. lxml locks a parser while it parses, so a parser another thread of the web worker was
+    using at fork time would block the child forever.
+    """
+    import docx.opc.oxml
+    import docx.oxml.parser
+    import pptx.oxml
+    import pptx.oxml.xmlchemy
+    for module, lookup in ((docx.opc.oxml, docx.opc.oxml.element_class_lookup),
+                           (docx.oxml.parser, docx.oxml.parser.element_class_lookup),
+                           (pptx.oxml, pptx.oxml.element_class_lookup)):
+        module.oxml_parser = etree.XMLParser(remove_blank_text=True, resolve_entities=False)
+        module.oxml_parser.set_element_class_lookup(lookup)
+    pptx.oxml.xmlchemy.oxml_parser = pptx.oxml.oxml_parser  # Imported by name there
+
+
+def _isolated_call(conn, func, args, kwargs, check_cache):
+    """Child process entry point: runs func and sends its result and cache writes back over conn."""
+    os.setpgid(0, 0)  # Lead a process group, so any workers the check starts are killed along with it
+    # Fresh stream objects: the inherited ones may be locked by a thread that was writing when the worker forked
+    sys.stdout = open(1, 'w', buffering=1, closefd=False)
+    sys.stderr = open(2, 'w', buffering=1, closefd=False)
+    _renew_xml_parsers()
+    global _check_cache, result_cache, admission
+    _check_cache = check_cache
+    result_cache, admission = ForkedStateGuard('result_cache'), ForkedStateGuard('admission')
+    threading.Thread(target=_watch_supervisor, args=(os.getppid(),), daemon=True).start()
+    try:
+        result = func(*args, **kwargs)
     except Exception as e:
         traceback.print_exc()
-        return False, "", [
+        result = (False, b'', [f'An unexpected error occurred: {e}'])
+    conn.send((result, check_cache.puts))
+    conn.close()
+
+
+def run_isolated(func, *args, check_cache=None, **kwargs):
+    """
+    Runs func(*args, **kwargs) in a forked child process and returns its result.
+    Forking lets the child use the parent's open upload streams and callbacks without pickling them.
+    The check reads the result cache through check_cache (a CheckCache the supervisor filled beforehand),
+    and the entries it stores through put_result_from_check() are written to result_cache here.
+    The child is killed, and BudgetExceeded raised, once it passes CHECK_TIMEOUT_SECONDS or CHECK_MAX_RSS_MB;
+    worker processes the check starts count toward the memory budget and are killed with the child.
+    """
+    context = multiprocessing.get_context('fork')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_isolated_call,
+                              args=(child_conn, func, args, kwargs, check_cache or CheckCache()))
+    process.start()
+    child_conn.close()
+    deadline = time.monotonic() + CHECK_TIMEOUT_SECONDS if CHECK_TIMEOUT_SECONDS > 0 else None
+    max_rss = CHECK_MAX_RSS_MB * 1024 * 1024
+    try:
+        while True:
+            if parent_conn.poll(0.1):
+                try:
+                    result, cache_puts = parent_conn.recv()
+                except EOFError:
+                    break  # The child exited without sending a result
+                for key, issues, report_bytes in cache_puts:
+                    result_cache.put(key, issues, report_bytes)
+                return result
+            if deadline is not None and time.monotonic() > deadline:
+                raise BudgetExceeded('time', CHECK_TIMEOUT_SECONDS,
+                                     f'The check was cancelled after exceeding its time budget of '
+                                     f'{CHECK_TIMEOUT_SECONDS:g} seconds. The document is too large or complex '
+                                     f'to check; try mode=scan or split the file.')
+            rss = child_rss_bytes(process.pid) if max_rss > 0 else None
+            if rss is not None and rss > max_rss:
+                raise BudgetExceeded('memory', CHECK_MAX_RSS_MB,
+                                     f'The check was cancelled after exceeding its memory budget of '
+                                     f'{CHECK_MAX_RSS_MB} MB. The document is too large or complex '
+                                     f'to check; try mode=scan or split the file.')
+            if not process.is_alive() and not parent_conn.poll():
+                break
+    finally:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass  # The child and its workers have all exited
+        if process.is_alive():
+            process.kill()  # Killed before it could start its process group
+        process.join()
+        parent_conn.close()
+    return False, b'', [f'The check process exited unexpectedly (exit code {process.exitcode}). '
+                        f'The document may be too large to process.']
+
+
+# --- Package triage ---
+# Many compatibility questions can be answered from the OOXML package listing alone. Triage reads only
+# the zip central directory and [Content_Types].xml, never the document parts themselves.
+
+CONTENT_TYPES_NS = '{http://schemas.openxmlformats.org/package/2006/content-types}'
+CONTENT_TYPES_MAX_BYTES = 1024 * 1024  # A real [Content_Types].xml is a few KB
+
+# Main part content type -> file type
+MAIN_PART_FILE_TYPES = {
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml': 'docx',
+    'application/vnd.ms-word.document.macroEnabled.main+xml': 'docm',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation.main+xml': 'pptx',
+    'application/vnd.ms-powerpoint.presentation.macroEnabled.main+xml': 'pptm',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml': 'xlsx',
+    'application/vnd.ms-excel.sheet.macroEnabled.main+xml': 'xlsm',
+}
+
+# (category, partname predicate, risk, needs_full_check, message). Partnames are lower-cased zip member names.
+TRIAGE_RULES = [
+    ('macros', lambda name: name.endswith('vbaproject.bin'), 'high', False,
+     'VBA macros are not supported in Google Docs, Slides or Sheets and will be lost upon conversion.'),
+    ('activex', lambda name: '/activex/' in name, 'high', False,
+     'ActiveX controls are not supported and will be lost upon conversion.'),
+    ('ole_objects', lambda name: '/embeddings/' in name, 'high', False,
+     'Embedded OLE objects or workbooks are converted to static images or dropped.'),
+    ('external_links', lambda name: name.startswith('xl/externallinks/'), 'high', False,
+     'Links to external workbooks do not survive conversion; formulas using them will break.'),
+    ('pivot_tables', lambda name: name.startswith(('xl/pivotcache/', 'xl/pivottables/')), 'high', True,
+     'Pivot tables and their caches may be rebuilt differently or lose formatting in Google Sheets.'),
+    ('slicers', lambda name: name.startswith(('xl/slicers/', 'xl/slicercaches/', 'xl/timelines/')), 'high', False,
+     'Slicers and timelines are not converted.'),
+    ('smartart', lambda name: '/diagrams/' in name, 'high', False,
+     'SmartArt diagrams are converted to flat images or lost.'),
+    ('charts', lambda name: '/charts/chart' in name, 'medium', False,
+     'Charts may change appearance, lose data links or be converted to images.'),
+    ('comments', lambda name: (name in ('word/comments.xml', 'word/commentsextended.xml')
+                               or name.startswith(('ppt/comments/', 'xl/threadedcomments/'))
+                               or (name.startswith('xl/comments') and name.endswith('.xml'))), 'medium', True,
+     'Comments are supported, but their anchors and positions need the full check to review.'),
+    ('media', lambda name: '/media/' in name, 'low', False,
+     'Embedded images and media are kept, but quality, scaling and effects may differ.'),
+]
+
+RISK_ORDER = ('none', 'low', 'medium', 'high')
+
+
+def read_content_types(archive):
+    """
+    Parses [Content_Types].xml into (defaults by extension, overrides by partname).
+    Returns empty maps if the part is missing, oversized or malformed.
+    """
+    try:
+        info = archive.getinfo('[Content_Types].xml')
+        if info.file_size > CONTENT_TYPES_MAX_BYTES:
+            return {}, {}
+        parser = etree.XMLParser(resolve_entities=False, no_network=True)
+        root = etree.fromstring(archive.read(info), parser)
+    except (KeyError, etree.XMLSyntaxError):
+        return {}, {}
+    defaults = {el.get('Extension', '').lower(): el.get('ContentType') for el in root.iter(CONTENT_TYPES_NS + 'Default')}
+    overrides = {el.get('PartName', '').lower(): el.get('ContentType') for el in root.iter(CONTENT_TYPES_NS + 'Override')}
+    return defaults, overrides
+
+
+def triage_package(file_obj):
+    """
+    Builds a part inventory and a quick risk classification for an OOXML package without parsing any
+    document part. Returns a dict with file_type (from the main part's content type), part sizes,
+    findings per TRIAGE_RULES category and an overall risk level. needs_full_check marks findings that
+    only the full check_* pass can assess in detail.
+    Raises zipfile.BadZipFile if file_obj is not a zip archive.
+    """
+    archive = zipfile.ZipFile(file_obj)
+    defaults, overrides = read_content_types(archive)
+
+    parts = []
+    findings = {}
+    file_type = None
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        name = info.filename
+        lower_name = name.lower()
+        content_type = overrides.get('/' + lower_name) or defaults.get(lower_name.rsplit('.', 1)[-1])
+        file_type = file_type or MAIN_PART_FILE_TYPES.get(content_type)
+        parts.append({'name': name, 'content_type': content_type,
+                      'compressed_size': info.compress_size, 'size': info.file_size})
+
+        for category, matches, risk, needs_full_check, message in TRIAGE_RULES:
+            if matches(lower_name):
+                finding = findings.setdefault(category, {
+                    'category': category, 'risk': risk, 'needs_full_check': needs_full_check,
+                    'message': message, 'count': 0, 'size': 0, 'parts': []})
+                finding['count'] += 1
+                finding['size'] += info.file_size
+                finding['parts'].append(name)
+                break
+
+    findings = sorted(findings.values(), key=lambda f: RISK_ORDER.index(f['risk']), reverse=True)
+    return {
+        'file_type': file_type,
+        'part_count': len(parts),
+        'total_compressed_size': sum(part['compressed_size'] for part in parts),
+        'total_size': sum(part['size'] for part in parts),
+        'parts': parts,
+        'findings': findings,
+        'risk': findings[0]['risk'] if findings else 'none',
+        'needs_full_check': any(f['needs_full_check'] for f in findings),
+    }
+
+
+# --- Package guard ---
+# Document(), Presentation() and load_workbook() inflate parts eagerly, so a small crafted package can
+# expand into gigabytes of XML. The guard reads only the zip central directory before any object model
+# is built: packages past the hard limits are rejected, and packages with more XML than the object
+# models handle comfortably are downgraded to a streaming scanner. zipfile never inflates a member
+# past its declared size, so the central directory sizes are upper bounds the parsers cannot exceed.
+PACKAGE_MAX_MEMBERS = int(os.environ.get('PACKAGE_MAX_MEMBERS', 10000))
+PACKAGE_MAX_PART_MB = int(os.environ.get('PACKAGE_MAX_PART_MB', 1024))
+PACKAGE_MAX_TOTAL_MB = int(os.environ.get('PACKAGE_MAX_TOTAL_MB', 2048))
+# Ratio of uncompressed to compressed size, only applied to parts of at least 1 MB
+PACKAGE_MAX_COMPRESSION_RATIO = int(os.environ.get('PACKAGE_MAX_COMPRESSION_RATIO', 200))
+# Total uncompressed XML above which the check runs in streaming mode
+PACKAGE_STREAM_XML_MB = int(os.environ.get('PACKAGE_STREAM_XML_MB', 64))
+
+PACKAGE_RATIO_MIN_PART_BYTES = 1024 * 1024
+XML_PART_EXTENSIONS = ('.xml', '.rels', '.vml')
+
+
+class PackageRejected(Exception):
+    """Raised when an uploaded package exceeds a hard size limit ('members', 'part_size', 'total_size',
+    'compression_ratio') or needs streaming mode that its file type does not support ('streaming')."""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+    def to_dict(self):
+        """Returns the structured error fields for a JSON response."""
+        return {'success': False, 'error': str(self), 'error_code': 'package_rejected', 'reason': self.reason}
+
+
+def check_package_limits(archive):
+    """
+    Checks every member of archive against the PACKAGE_MAX_* limits using only the central directory.
+    Returns the total uncompressed size of the XML parts. Raises PackageRejected on the first limit exceeded.
+    """
+    infos = archive.infolist()
+    if len(infos) > PACKAGE_MAX_MEMBERS:
+        raise PackageRejected('members', f'The file contains {len(infos)} archive members; '
+                                         f'the limit is {PACKAGE_MAX_MEMBERS}.')
+    total_size = 0
+    xml_size = 0
+    for info in infos:
+        if info.file_size > PACKAGE_MAX_PART_MB * 1024 * 1024:
+            raise PackageRejected('part_size', f'The part {info.filename} expands to {info.file_size // 2 ** 20} MB; '
+                                               f'the limit is {PACKAGE_MAX_PART_MB} MB per part.')
+        if (info.file_size >= PACKAGE_RATIO_MIN_PART_BYTES
+                and info.file_size > PACKAGE_MAX_COMPRESSION_RATIO * max(info.compress_size, 1)):
+            raise PackageRejected('compression_ratio',
+                                  f'The part {info.filename} is compressed more than '
+                                  f'{PACKAGE_MAX_COMPRESSION_RATIO}:1, which is typical of a decompression bomb.')
+        total_size += info.file_size
+        if info.filename.lower().endswith(XML_PART_EXTENSIONS):
+            xml_size += info.file_size
+    if total_size > PACKAGE_MAX_TOTAL_MB * 1024 * 1024:
+        raise PackageRejected('total_size', f'The file expands to {total_size // 2 ** 20} MB; '
+                                            f'the limit is {PACKAGE_MAX_TOTAL_MB} MB.')
+    return xml_size
+
+
+def guard_package(file_obj):
+    """
+    Decides how a package may be parsed: returns 'full' for the regular checkers or 'stream' for the
+    streaming scanners, and raises PackageRejected past the hard limits.
+    Non-zip input returns 'full' so the checker reports its usual invalid-file error.
+    file_obj is rewound afterwards.
+    """
+    try:
+        xml_size = check_package_limits(zipfile.ZipFile(file_obj))
+    except zipfile.BadZipFile:
+        return 'full'
+    finally:
+        file_obj.seek(0)
+    return 'stream' if xml_size > PACKAGE_STREAM_XML_MB * 1024 * 1024 else 'full'
+
+
+def iterparse_cleared(source, tags, events=('end',)):
+    """
+    Yields (event, element) for each element with one of tags as events are parsed. After its 'end'
+    event an element is freed along with any already processed siblings, so memory stays bounded
+    however large the part is. Elements nested inside a yielded element are freed with it.
+    """
+    for event, element in etree.iterparse(source, events=events, tag=tags, resolve_entities=False,
+                                          no_network=True, huge_tree=True):
+        yield event, element
+        if event != 'end':
+            continue
+        element.clear()
+        parent = element.getparent()
+        while parent is not None and element.getprevious() is not None:
+            del parent[0]
+
+
+SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+# Worksheet element -> EXCEL_ISSUES key it reports
+EXCEL_STREAMING_ISSUE_TAGS = {
+    SPREADSHEET_NS + 'f': 'formulas',
+    SPREADSHEET_NS + 'mergeCell': 'merged_cells',
+    SPREADSHEET_NS + 'conditionalFormatting': 'conditional_formatting',
+    SPREADSHEET_NS + 'dataValidation': 'data_validation',
+}
+
+
+def check_excel_streaming(input_file, original_filename="document.xlsx", mode="report", progress=None):
+    """
+    Scans a workbook too large for openpyxl by streaming each worksheet's XML. Reports the same
+    workbook-level issues as check_excel_google_sheets_compatibility but never builds a report,
+    so output is None in either mode. Stops reading a sheet once every issue it can report is found.
+    """
+    try:
+        archive = zipfile.ZipFile(open_input_file(input_file))
+        names = [name for name in archive.namelist() if not name.endswith('/')]
+        issues = {'macros'} if any(name.lower().endswith('vbaproject.bin') for name in names) else set()
+        issues.update(('charts', 'images'))
+        if any(name.lower().startswith('xl/comments') and name.lower().endswith('.xml') for name in names):
+            issues.add('comments')
+
+        sheets = sorted(name for name in names if re.match(r'xl/worksheets/sheet\d+\.xml$', name))
+        row_tag = SPREADSHEET_NS + 'row'
+        for sheet_idx, name in enumerate(sheets):
+            report_progress(progress, f'Sheet {sheet_idx + 1}/{len(sheets)} (streaming)', sheet_idx + 1, len(sheets))
+            if issues.issuperset(EXCEL_STREAMING_ISSUE_TAGS.values()):
+                break
+            with archive.open(name) as part:
+                for _, element in iterparse_cleared(part, [row_tag, *EXCEL_STREAMING_ISSUE_TAGS]):
+                    key = EXCEL_STREAMING_ISSUE_TAGS.get(element.tag)
+                    if key is not None:
+                        issues.add(key)
+                        if issues.issuperset(EXCEL_STREAMING_ISSUE_TAGS.values()):
+                            break
+
+        issues_found = [EXCEL_ISSUES[key] for key in EXCEL_ISSUES if key in issues]
+        issues_found.append(
+            'Large File: This workbook was checked in streaming mode because of its size. Only workbook-level '
+            'issues are listed and no highlighted report was generated.')
+        return True, None, issues_found
+    except Exception as e:
+        traceback.print_exc()
+        return False, b"", [
             f"An unexpected error occurred during Excel processing: {e}. Please ensure it's a valid .xlsx or .xlsm file. Details: {str(e)}"]
 
 
+PACKAGE_RELATIONSHIPS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+def read_part_relationships(archive, partname):
+    """
+    Returns (relationship id, relationship type, target member name) for every internal relationship of
+    the package part partname ('' for the package itself), streamed from its .rels part. The type is the
+    last segment of the relationship type URI, e.g. 'officeDocument' or 'header'.
+    """
+    directory, name = posixpath.split(partname)
+    rels_name = posixpath.join(directory, '_rels', name + '.rels')
+    if rels_name not in archive.NameToInfo:
+        return []
+    relationships = []
+    with archive.open(rels_name) as part:
+        for _, rel in iterparse_cleared(part, PACKAGE_RELATIONSHIPS_NS + 'Relationship'):
+            if rel.get('TargetMode') == 'External':
+                continue
+            target = rel.get('Target', '')
+            target = target[1:] if target.startswith('/') else posixpath.normpath(posixpath.join(directory, target))
+            relationships.append((rel.get('Id'), rel.get('Type', '').rsplit('/', 1)[-1], target))
+    return relationships
+
+
+def scan_word_part(part, partname, tracked_changes, merged_cells=None, objects=None, fonts=None):
+    """
+    Streams one Word content part. Revision markup is counted in tracked_changes['counts'] by local name,
+    and each distinct (partname, paragraph, type) goes to tracked_changes['locations'], where paragraph is
+    the 1-based index among the part's w:p elements (tables included) or None outside any paragraph.
+    If merged_cells is a list, merged table cells are appended as {'table', 'row', 'column', 'columns',
+    'vertical'}: table number in document order, row number, starting grid column, grid columns spanned
+    and whether the cell starts a vertical merge (continuation cells are not listed).
+    If objects is a list, (type, relationship id, paragraph) is appended for every object classify_word_object()
+    accepts. If fonts is a WordFontInventory, the part's w:rFonts and style references are added to it.
+    Paragraphs and tables are numbered by their start tags, which is document order.
+    """
+    paragraph_tag, table_tag, row_tag, cell_tag = qn('w:p'), qn('w:tbl'), qn('w:tr'), qn('w:tc')
+    cell_properties_tag = qn('w:tcPr')
+    counts = tracked_changes['counts']
+    locations = tracked_changes['locations']
+    seen = set()
+    open_paragraphs = []
+    open_tables = []  # [table number, row number, next grid column, current cell or None]
+    position = 0
+    tables = 0
+    tags = [paragraph_tag, row_tag, *REVISION_TAGS]
+    if merged_cells is not None:
+        tags += [table_tag, cell_tag, *MERGE_TAGS]
+    if objects is not None:
+        tags += OBJECT_TAGS
+    if fonts is not None:
+        tags += [qn('w:rFonts'), *STYLE_REFERENCE_TAGS]
+    for event, element in iterparse_cleared(part, tags, events=('start', 'end')):
+        tag = element.tag
+        if tag == qn('w:rFonts'):
+            if event == 'start':
+                fonts.add_rfonts(element)
+        elif tag in STYLE_REFERENCE_TAGS:
+            if event == 'start':
+                fonts.add_style_reference(element.get(qn('w:val')))
+        elif tag in OBJECT_TAGS:
+            # Read at the end tag, while the object's own markup is still in memory
+            classified = classify_word_object(element) if event == 'end' else None
+            if classified is not None:
+                objects.append((*classified, open_paragraphs[-1] if open_paragraphs else None))
+        elif tag == paragraph_tag:
+            if event == 'start':
+                position += 1
+                open_paragraphs.append(position)
+            else:
+                open_paragraphs.pop()
+        elif tag == table_tag:
+            if event == 'start':
+                tables += 1
+                open_tables.append([tables, 0, 1, None])
+            else:
+                open_tables.pop()
+        elif tag == row_tag:
+            if event == 'start' and open_tables:
+                open_tables[-1][1] += 1
+                open_tables[-1][2] = 1
+        elif tag == cell_tag:
+            if event == 'start':
+                table = open_tables[-1]
+                table[3] = {'table': table[0], 'row': table[1], 'column': table[2], 'columns': 1, 'vertical': False}
+                table[2] += 1
+            else:
+                cell = open_tables[-1][3]
+                if cell['columns'] > 1 or cell['vertical']:
+                    merged_cells.append(cell)
+        elif tag in MERGE_TAGS:
+            parent = element.getparent()
+            if (event != 'start' or parent is None or parent.tag != cell_properties_tag
+                    or parent.getparent() is None or parent.getparent().tag != cell_tag):
+                continue  # Only the cell's own properties count, not a tracked property change
+            cell = open_tables[-1][3]
+            if tag == qn('w:gridSpan'):
+                cell['columns'] = int(element.get(qn('w:val'), 1))
+                open_tables[-1][2] += cell['columns'] - 1
+            elif element.get(qn('w:val')) == 'restart':
+                cell['vertical'] = True
+        elif event == 'start':
+            local_name = etree.QName(element).localname
+            counts[local_name] = counts.get(local_name, 0) + 1
+            location = (partname, open_paragraphs[-1] if open_paragraphs else None, local_name)
+            if location not in seen:
+                seen.add(location)
+                locations.append({'part': location[0], 'paragraph': location[1], 'type': local_name})
+
+
+def check_word_streaming(input_file, original_filename="document.docx", mode="report", progress=None):
+    """
+    Scans a document too large for python-docx by streaming its main part, headers, footers, notes and
+    comments. Reports the same issues as check_word_google_docs_compatibility but never builds a report,
+    so output is None in either mode.
+    """
+    try:
+        findings = analyse_word_package(zipfile.ZipFile(open_input_file(input_file)), progress)
+        issues_found = word_findings_issues(findings, mode)
+        issues_found.append(
+            'Large File: This document was checked in streaming mode because of its size. '
+            'No highlighted report was generated.')
+        return True, None, issues_found
+    except Exception as e:
+        traceback.print_exc()
+        return False, b"", [
+            f"An unexpected error occurred during Word processing: {e}. Please ensure it's a valid .docx file."]
+
+
+# Streaming scanner by file type, used when guard_package downgrades a check
+STREAMING_CHECKERS = {
+    'docx': check_word_streaming,
+    'xlsx': check_excel_streaming,
+    'xlsm': check_excel_streaming,
+}
+
+
+# --- Incremental Word analysis ---
+# Word issues are detected part by part, and each part's findings are cached under the SHA-256 of its
+# content. Re-checking a revised upload only re-scans the parts whose bytes changed; the findings of the
+# others (headers, footers, notes, styles, numbering, comments, and the body if only they changed) come
+# from the result cache. Parts are read twice on a miss, once to hash and once to scan, to keep memory bounded.
+# The supervisor hashes the parts and looks up their findings before forking the check process, so the
+# child never opens the cache; new findings go back to the supervisor with the result.
+
+def hash_package_part(archive, name):
+    """Returns the SHA-256 hex digest of a package member's uncompressed content."""
+    with archive.open(name) as part:
+        return copy_and_hash(part)
+
+
+def scan_word_story_part(part, partname, is_main, theme_fonts):
+    """Scans a body, header, footer or notes part and returns its findings as a JSON-serializable dict."""
+    tracked_changes = {'counts': {}, 'locations': []}
+    merged_cells = [] if is_main else None  # Merged cells are reported for the body only
+    objects = []
+    fonts = WordFontInventory(theme_fonts)
+    scan_word_part(part, partname, tracked_changes, merged_cells=merged_cells, objects=objects, fonts=fonts)
+    # Cells are recorded as they close, so nested tables come out ahead of their enclosing cell
+    merged_cells = sorted(merged_cells or [], key=lambda cell: (cell['table'], cell['row'], cell['column']))
+    return {'tracked_changes': tracked_changes, 'merged_cells': merged_cells, 'objects': objects,
+            'font_counts': fonts.font_counts, 'used_styles': list(fonts.used_styles)}
+
+
+def scan_word_styles_part(part, theme_fonts):
+    """Reads the style definitions and document default fonts of a styles part."""
+    fonts = WordFontInventory(theme_fonts)
+    for _, element in iterparse_cleared(part, [qn('w:docDefaults'), qn('w:style')]):
+        if element.tag == qn('w:style'):
+            fonts.add_style(element)
+        else:
+            for r_fonts in element.iter(qn('w:rFonts')):
+                fonts.add_rfonts(r_fonts)
+    styles = {style_id: [based_on, is_default, [sorted(names) for names in font_sets]]
+              for style_id, (based_on, is_default, font_sets) in fonts.styles.items()}
+    return {'font_counts': fonts.font_counts, 'styles': styles}
+
+
+def scan_word_numbering_part(part, theme_fonts):
+    """Reads the fonts of the numbered list levels in a numbering part."""
+    fonts = WordFontInventory(theme_fonts)
+    for _, level in iterparse_cleared(part, qn('w:lvl')):
+        fonts.add_level(level)
+    return {'font_counts': fonts.font_counts}
+
+
+def scan_word_comments_part(part):
+    """Reports whether a comments part holds any comment."""
+    return {'comments': next(iterparse_cleared(part, qn('w:comment')), None) is not None}
+
+
+def word_part_cache_key(kind, partname, digest, theme_digest=''):
+    """
+    Builds the result cache key for the findings of a package part with content digest. theme_digest is
+    part of the key for findings that resolve theme fonts.
+    """
+    return '|'.join(['word-part', kind, posixpath.basename(partname), digest, theme_digest, CHECKER_VERSION])
+
+
+def read_word_package_parts(archive):
+    """
+    Lists the parts whose findings analyse_word_package() caches. Returns (main_part, theme_fonts, parts):
+    the main part's name, the theme fonts, and a (partname, kind, theme_digest) triple per part present in
+    the package, where kind is 'comments', 'styles', 'numbering', 'body' or 'story' and story parts come last.
+    """
+    main_part = next((target for _, rel_type, target in read_part_relationships(archive, '')
+                      if rel_type == 'officeDocument'), 'word/document.xml')
+    related = [(rel_type, target) for _, rel_type, target in read_part_relationships(archive, main_part)
+               if target in archive.NameToInfo]
+
+    theme_fonts, theme_digest = {}, ''
+    for rel_type, target in related:
+        if rel_type == 'theme' and archive.getinfo(target).file_size <= THEME_MAX_BYTES:
+            theme_xml = archive.read(target)
+            theme_fonts, theme_digest = read_theme_fonts(theme_xml), hashlib.sha256(theme_xml).hexdigest()
+
+    parts = [(target, rel_type, '' if rel_type == 'comments' else theme_digest) for rel_type, target in related
+             if rel_type in ('comments', 'styles', 'numbering')]
+    if main_part in archive.NameToInfo:
+        parts.append((main_part, 'body', theme_digest))
+    parts += [(target, 'story', theme_digest) for rel_type, target in related if rel_type in STORY_RELATIONSHIP_TYPES]
+    return main_part, theme_fonts, parts
+
+
+def prefetch_word_part_findings(input_file):
+    """
+    Hashes the parts of a Word package and looks up their cached findings, ahead of the isolated check
+    that will need them. Returns (cache entries by key, part digests by name) for run_isolated(); both
+    are empty when input_file is not a readable package, which the check itself then reports.
+    """
+    entries, digests = {}, {}
+    try:
+        archive = zipfile.ZipFile(open_input_file(input_file))
+        for partname, kind, theme_digest in read_word_package_parts(archive)[2]:
+            digests[partname] = hash_package_part(archive, partname)
+            key = word_part_cache_key(kind, partname, digests[partname], theme_digest)
+            cached = result_cache.get(key)
+            if cached is not None:
+                entries[key] = cached
+    except Exception:
+        pass  # A damaged package is reported by the check itself
+    finally:
+        input_file.seek(0)
+    return entries, digests
+
+
+def cached_word_part_findings(archive, name, kind, scan, theme_digest=''):
+    """
+    Returns scan(part) for package member name, from the result cache when a part with the same content,
+    name and kind was scanned before. In an isolated check the part digests and cache entries come from
+    prefetch_word_part_findings() in the supervisor.
+    """
+    digest = get_part_digest_from_check(name) or hash_package_part(archive, name)
+    key = word_part_cache_key(kind, name, digest, theme_digest)
+    cached = get_result_from_check(key)
+    if cached is not None:
+        return json.loads(cached[0][0])
+    with archive.open(name) as part:
+        findings = scan(part)
+    put_result_from_check(key, [json.dumps(findings)], None)
+    return findings
+
+
+def analyse_word_package(archive, progress=None):
+    """
+    Detects the issues of a Word package without building its object model, reusing the cached findings
+    of unchanged parts. Returns {'main_part', 'comments', 'tracked_changes', 'merged_cells', 'objects',
+    'font_counts'}: the main part's file name, whether there are comments, the merged revision counts and
+    locations, the body's merged cells, word_object_entry() dicts for every object, and font uses.
+    """
+    main_part, theme_fonts, parts = read_word_package_parts(archive)
+    fonts = WordFontInventory(theme_fonts)
+
+    comments = False
+    story_parts = []
+    for partname, kind, theme_digest in parts:
+        if kind == 'comments':
+            comments = comments or cached_word_part_findings(archive, partname, 'comments',
+                                                             scan_word_comments_part)['comments']
+        elif kind == 'styles':
+            findings = cached_word_part_findings(archive, partname, 'styles', functools.partial(
+                scan_word_styles_part, theme_fonts=theme_fonts), theme_digest)
+            fonts.styles.update((style_id, tuple(style)) for style_id, style in findings['styles'].items())
+            fonts.add_counts(findings['font_counts'])
+        elif kind == 'numbering':
+            findings = cached_word_part_findings(archive, partname, 'numbering', functools.partial(
+                scan_word_numbering_part, theme_fonts=theme_fonts), theme_digest)
+            fonts.add_counts(findings['font_counts'])
+        else:
+            story_parts.append((partname, kind, theme_digest))
+
+    tracked_changes = {'counts': {}, 'locations': []}
+    merged_cells = []
+    objects = []
+    image_headers = {}
+    for part_idx, (partname, kind, theme_digest) in enumerate(story_parts):
+        report_progress(progress, f'Part {part_idx + 1}/{len(story_parts)}', part_idx + 1, len(story_parts))
+        basename = posixpath.basename(partname)
+        is_main = kind == 'body'
+        findings = cached_word_part_findings(
+            archive, partname, kind,
+            functools.partial(scan_word_story_part, partname=basename, is_main=is_main, theme_fonts=theme_fonts),
+            theme_digest)
+        for tag, count in findings['tracked_changes']['counts'].items():
+            tracked_changes['counts'][tag] = tracked_changes['counts'].get(tag, 0) + count
+        tracked_changes['locations'] += findings['tracked_changes']['locations']
+        merged_cells += findings['merged_cells']
+        fonts.add_counts(findings['font_counts'])
+        fonts.used_styles.update(findings['used_styles'])
+
+        # Related parts are sized from the zip directory, and images from their first bytes, which is cheaper
+        # than hashing them. Each image is read once, however often it is referenced.
+        targets = {rel_id: target for rel_id, _, target in read_part_relationships(archive, partname)}
+        for object_type, rel_id, paragraph in findings['objects']:
+            target = targets.get(rel_id)
+            size, header = None, None
+            if target in archive.NameToInfo:
+                size = archive.getinfo(target).file_size
+                if object_type == 'image':
+                    if target not in image_headers:
+                        with archive.open(target) as media:
+                            image_headers[target] = media.read(IMAGE_HEADER_BYTES)
+                    header = image_headers[target]
+            objects.append(word_object_entry(object_type, basename, paragraph, target, size, header))
+
+    return {'main_part': posixpath.basename(main_part), 'comments': comments, 'tracked_changes': tracked_changes,
+            'merged_cells': merged_cells, 'objects': objects, 'font_counts': fonts.counts()}
+
+
+def word_findings_issues(findings, mode="report"):
+    """
+    Turns analyse_word_package() findings into the Word checker's issues.
+    In mode="scan" tracked changes and merged cells are reported without their locations.
+    """
+    # Removed the problematic 'if doc.has_macros:' check as python-docx does not directly support it.
+    # A general warning about macros is still relevant for users.
+    issues_found = [WORD_ISSUES['macros']]
+    if findings['comments']:
+        issues_found.append(WORD_ISSUES['comments'])
+    tracked_changes = findings['tracked_changes']
+    if tracked_changes['counts']:
+        issue = WORD_ISSUES['tracked_changes']
+        if mode != 'scan':
+            issue += ' ' + describe_tracked_changes(tracked_changes)
+        issues_found.append(issue)
+    if findings['merged_cells']:
+        issue = WORD_ISSUES['merged_cells']
+        if mode != 'scan':
+            issue += ' ' + describe_merged_cells(findings['merged_cells'])
+        issues_found.append(issue)
+    issues_found.extend(word_object_issues(findings['objects']))
+    issues_found.extend(word_font_issues(findings['font_counts']))
+    return issues_found
+
+
+# --- Result cache ---
+# Bump CHECKER_VERSION whenever a checker's issues or report output changes, so stale cached results are not served.
+CHECKER_VERSION = '11'
+# 'sqlite' keeps results in one database file shared by every gunicorn worker and kept across restarts;
+# 'memory' keeps a private LRU per process.
+RESULT_CACHE_BACKEND = os.environ.get('RESULT_CACHE_BACKEND', 'sqlite')
+RESULT_CACHE_PATH = os.environ.get('RESULT_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'officecheck-cache.sqlite3'))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get('RESULT_CACHE_TTL_SECONDS', 7 * 24 * 60 * 60))
+
+
+class ResultCache:
+    """
+    In-process LRU cache of successful check results, bounded by a byte budget.
+    Values are (issues, report_bytes) pairs; report_bytes is None for scan results.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # key -> (issues, report_bytes, size), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (issues, report_bytes) for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return list(entry[0]), entry[1]
+
+    def put(self, key, issues, report_bytes):
+        """Stores a result, evicting least recently used entries until the cache fits its budget."""
+        size = len(report_bytes or b'') + sum(len(issue) for issue in issues) + len(key)
+        if size > self.max_bytes:
+            return  # Would evict everything else and still not fit
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[2]
+            self._entries[key] = (list(issues), report_bytes, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+
+class SqliteResultCache:
+    """
+    Persistent check result cache in a SQLite database, safe to share between processes.
+    Same interface as ResultCache. Entries expire after ttl_seconds, and the least recently used
+    entries are evicted once the stored total exceeds max_bytes. Database errors are logged and
+    treated as cache misses, so a broken cache never fails a check.
+    """
+
+    def __init__(self, path, max_bytes, ttl_seconds):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        try:
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')  # Readers do not block the writer
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS results ('
+                    'key TEXT PRIMARY KEY, issues TEXT NOT NULL, report BLOB, size INTEGER NOT NULL, '
+                    'created_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+                conn.execute('CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)')
+        except sqlite3.Error:
+            traceback.print_exc()
+
+    def _connect(self):
+        # A short-lived connection per call: connections must not cross a fork, and opening one is cheap.
+        # isolation_level=None leaves transactions to the explicit BEGIN IMMEDIATE in put().
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        return contextlib.closing(conn)
+
+    def get(self, key):
+        """Returns (issues, report_bytes) for key, or None on a miss or expired entry."""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT issues, report FROM results WHERE key = ? AND created_at > ?',
+                                   (key, now - self.ttl_seconds)).fetchone()
+                if row is None:
+                    return None
+                conn.execute('UPDATE results SET accessed_at = ? WHERE key = ?', (now, key))
+                return json.loads(row[0]), row[1]
+        except sqlite3.Error:
+            traceback.print_exc()
+            return None
+
+    def put(self, key, issues, report_bytes):
+        """Stores a result, then drops expired entries and evicts least recently used ones over the budget."""
+        size = len(report_bytes or b'') + sum(len(issue) for issue in issues) + len(key)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute('BEGIN IMMEDIATE')  # Serialise writers across worker processes
+                try:
+                    conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                                 (key, json.dumps(issues), report_bytes, size, now, now))
+                    conn.execute('DELETE FROM results WHERE created_at <= ?', (now - self.ttl_seconds,))
+                    excess = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0] - self.max_bytes
+                    if excess > 0:
+                        evict = []
+                        for evict_key, evict_size in conn.execute(
+                                'SELECT key, size FROM results ORDER BY accessed_at'):
+                            if excess <= 0:
+                                break
+                            evict.append((evict_key,))
+                            excess -= evict_size
+                        conn.executemany('DELETE FROM results WHERE key = ?', evict)
+                    conn.execute('COMMIT')
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
+        except sqlite3.Error:
+            traceback.print_exc()
+
+
+if RESULT_CACHE_BACKEND == 'sqlite':
+    result_cache = SqliteResultCache(RESULT_CACHE_PATH, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS)
+else:
+    result_cache = ResultCache(RESULT_CACHE_MAX_BYTES)
+
+
+class CheckCache:
+    """
+    The result cache as seen from inside an isolated check process, which must not open result_cache
+    itself (see ForkedStateGuard). Lookups are served from entries the supervisor fetched before forking,
+    and writes are collected in puts for the supervisor to store once the check returns. part_digests
+    holds the package part hashes the supervisor computed on the way, so the child need not re-read them.
+    """
+
+    def __init__(self, entries=None, part_digests=None):
+        self.entries = dict(entries or {})
+        self.part_digests = dict(part_digests or {})
+        self.puts = []
+
+    def get(self, key):
+        """Returns (issues, report_bytes) for key, or None if the supervisor had no entry."""
+        return self.entries.get(key)
+
+    def put(self, key, issues, report_bytes):
+        """Records an entry for the supervisor to store."""
+        self.entries[key] = (issues, report_bytes)
+        self.puts.append((key, issues, report_bytes))
+
+
+# The CheckCache of the isolated check running in this process, or None outside a check process
+_check_cache = None
+
+
+def get_result_from_check(key):
+    """Looks up a cache entry from inside a checker, through the supervisor's prefetched entries when run isolated."""
+    return (result_cache if _check_cache is None else _check_cache).get(key)
+
+
+def put_result_from_check(key, issues, report_bytes):
+    """Stores a cache entry from inside a checker, deferring it to the supervisor when run isolated."""
+    (result_cache if _check_cache is None else _check_cache).put(key, issues, report_bytes)
+
+
+def get_part_digest_from_check(partname):
+    """Returns the digest the supervisor computed for a package part of the isolated check, or None."""
+    return None if _check_cache is None else _check_cache.part_digests.get(partname)
+
+
+def copy_and_hash(src, dst=None):
+    """
+    Returns the SHA-256 hex digest of the binary stream src, copying it to dst on the way if given.
+    Seekable sources are rewound before and after reading.
+    """
+    digest = hashlib.sha256()
+    if src.seekable():
+        src.seek(0)
+    for chunk in iter(lambda: src.read(1024 * 1024), b''):
+        digest.update(chunk)
+        if dst is not None:
+            dst.write(chunk)
+    if src.seekable():
+        src.seek(0)
+    return digest.hexdigest()
+
+
+def result_cache_key(digest, file_type, filename, options):
+    """
+    Builds the cache key for a check: content hash, file type, checker version and options.
+    Reports embed the original filename, so only scan results are shared between differently named uploads.
+    """
+    name = '' if options.get('mode') == 'scan' else filename
+    return '|'.join([digest, file_type, CHECKER_VERSION, json.dumps(options, sort_keys=True), name])
+
+
+def run_check_cached(file_type, input_file, filename, options, digest):
+    """
+    run_check() behind the result cache and admission control. Returns (success, output_bytes, issues, cached).
+    Cache hits are served without taking an admission slot. Only successful results are cached,
+    so a failure is retried on the next upload.
+    Raises AdmissionRejected when the server is too busy to start the check.
+    """
+    key = result_cache_key(digest, file_type, filename, options)
+    cached = result_cache.get(key)
+    if cached is not None:
+        issues, output_bytes = cached
+        return True, output_bytes, issues, True
+    with admission.admit(estimate_check_cost(file_type, file_size(input_file))):
+        success, output_bytes, issues = run_check(file_type, input_file, filename, **options)
+    if success:
+        result_cache.put(key, issues, output_bytes)
+    return success, output_bytes, issues, False
+
+
+# --- Admission control ---
+# All gunicorn workers on a host share one admission budget, kept in a SQLite database: checks are
+# admitted until the summed estimated cost of the running ones reaches ADMISSION_MAX_COST_MB.
+# Further requests wait in a bounded FIFO queue, and are turned away with 503 + Retry-After when the
+# queue is full or their wait exceeds ADMISSION_QUEUE_TIMEOUT_SECONDS.
+ADMISSION_MAX_COST_MB = int(os.environ.get('ADMISSION_MAX_COST_MB', 400))
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 8))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_SECONDS', 20))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get('ADMISSION_RETRY_AFTER_SECONDS', 10))
+ADMISSION_DB_PATH = os.environ.get('ADMISSION_DB_PATH',
+                                   os.path.join(tempfile.gettempdir(), 'officecheck-admission.sqlite3'))
+ADMISSION_POLL_SECONDS = 0.1
+
+# Rough peak-memory multiple of the file size for each checker; openpyxl workbooks inflate the most.
+CHECK_COST_FACTORS = {
+    'docx': 5,
+    'pptx': 3,
+    'xlsx': 10,
+    'xlsm': 10,
+}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a check cannot be admitted; retry_after is the suggested client back-off in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Weighted semaphore with a bounded FIFO wait queue, shared by every process using the same database.
+    Each admitted or waiting request is a row tagged with its process id; rows of processes that have
+    exited are dropped, so a killed worker does not leak budget. Waiters poll the table, since there is
+    no cross-process condition variable.
+    A cost larger than the whole budget is clamped to it, so an oversized check still runs, alone.
+    Database errors are logged and admit the request, so a broken database never blocks checks.
+    """
+
+    def __init__(self, path, max_cost, max_queue, queue_timeout, retry_after):
+        self.path = path
+        self.max_cost = max_cost
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        try:
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS admissions ('
+                    'seq INTEGER PRIMARY KEY AUTOINCREMENT, ticket TEXT UNIQUE NOT NULL, cost INTEGER NOT NULL, '
+                    'pid INTEGER NOT NULL, admitted INTEGER NOT NULL)')
+        except sqlite3.Error:
+            traceback.print_exc()
+
+    def _connect(self):
+        # A short-lived connection per call, as in SqliteResultCache
+        return contextlib.closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def _transaction(self, conn, step):
+        """Runs step(conn) under BEGIN IMMEDIATE after dropping rows of exited processes, and returns its result."""
+        conn.execute('BEGIN IMMEDIATE')  # Serialise admission decisions across worker processes
+        try:
+            for (pid,) in conn.execute('SELECT DISTINCT pid FROM admissions').fetchall():
+                if not process_alive(pid):
+                    conn.execute('DELETE FROM admissions WHERE pid = ?', (pid,))
+            result = step(conn)
+            conn.execute('COMMIT')
+            return result
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _in_use(self, conn):
+        return conn.execute('SELECT COALESCE(SUM(cost), 0) FROM admissions WHERE admitted = 1').fetchone()[0]
+
+    def acquire(self, cost, timeout=None):
+        """
+        Takes cost units of budget, waiting up to timeout seconds (default queue_timeout) behind earlier requests.
+        Returns a ticket to pass to release(). Raises AdmissionRejected if it cannot be admitted.
+        """
+        cost = min(cost, self.max_cost)
+        timeout = self.queue_timeout if timeout is None else timeout
+        ticket = uuid.uuid4().hex
+
+        def enter(conn):
+            waiting = conn.execute('SELECT COUNT(*) FROM admissions WHERE admitted = 0').fetchone()[0]
+            admitted = not waiting and self._in_use(conn) + cost <= self.max_cost
+            if not admitted and (timeout <= 0 or waiting >= self.max_queue):
+                raise AdmissionRejected('The server is busy checking other files.', self.retry_after)
+            conn.execute('INSERT INTO admissions (ticket, cost, pid, admitted) VALUES (?, ?, ?, ?)',
+                         (ticket, cost, os.getpid(), int(admitted)))
+            return admitted
+
+        def admit_if_first(conn):
+            head = conn.execute('SELECT ticket FROM admissions WHERE admitted = 0 ORDER BY seq LIMIT 1').fetchone()
+            if head is None or head[0] != ticket or self._in_use(conn) + cost > self.max_cost:
+                return False
+            conn.execute('UPDATE admissions SET admitted = 1 WHERE ticket = ?', (ticket,))
+            return True
+
+        try:
+            with self._connect() as conn:
+                if self._transaction(conn, enter):
+                    return ticket
+            deadline = time.monotonic() + timeout
+            while True:
+                time.sleep(ADMISSION_POLL_SECONDS)
+                with self._connect() as conn:
+                    if self._transaction(conn, admit_if_first):
+                        return ticket
+                if time.monotonic() > deadline:
+                    self.release(ticket)
+                    raise AdmissionRejected('The server is busy checking other files.', self.retry_after)
+        except sqlite3.Error:
+            traceback.print_exc()
+            return ticket
+
+    def release(self, ticket):
+        """Returns the budget held (or the queue place taken) by ticket."""
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM admissions WHERE ticket = ?', (ticket,))
+        except sqlite3.Error:
+            traceback.print_exc()
+
+    @contextlib.contextmanager
+    def admit(self, cost, timeout=None):
+        """Context manager holding cost units of budget for the duration of the block."""
+        ticket = self.acquire(cost, timeout)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+
+admission = AdmissionController(ADMISSION_DB_PATH, ADMISSION_MAX_COST_MB * 1024 * 1024, ADMISSION_MAX_QUEUE,
+                                ADMISSION_QUEUE_TIMEOUT_SECONDS, ADMISSION_RETRY_AFTER_SECONDS)
+
+
+def file_size(file_obj):
+    """Returns the size in bytes of a seekable binary file, leaving it rewound."""
+    file_obj.seek(0, os.SEEK_END)
+    size = file_obj.tell()
+    file_obj.seek(0)
+    return size
+
+
+def estimate_check_cost(file_type, size):
+    """Estimates a check's peak memory in bytes from the file size and type."""
+    return size * CHECK_COST_FACTORS.get(file_type, 10)
+
+
+def admission_rejected_response(e):
+    """Builds the 503 response for an AdmissionRejected error."""
+    response = jsonify({'success': False, 'error': f'{e} Please retry in {e.retry_after} seconds.'})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+
 # --- Flask App Setup ---
 app = Flask(__name__)
 CORS(app)  # Allow cross-origin requests for development
 
+# Raw uploads are spooled in memory up to this size, then to a temporary file on disk.
+UPLOAD_SPOOL_MAX_BYTES = int(os.environ.get('UPLOAD_SPOOL_MAX_BYTES', 8 * 1024 * 1024))
+
+
+# Generated reports are written here and served by GET /reports/<id>. A directory on local disk is
+# shared by every gunicorn worker, so any worker can serve a report another one produced.
+REPORTS_DIR = os.environ.get('REPORTS_DIR', os.path.join(tempfile.gettempdir(), 'officecheck-reports'))
+REPORT_TTL_SECONDS = int(os.environ.get('REPORT_TTL_SECONDS', 60 * 60))
+
+REPORT_MIME_TYPES = {
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'xlsm': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Report and job ids are uuid4 hex strings
+REPORT_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_last_purge_times = {}
+
+
+def purge_expired_files(directory):
+    """Deletes files in directory older than REPORT_TTL_SECONDS. Runs at most once a minute per directory and process."""
+    now = time.time()
+    if now - _last_purge_times.get(directory, 0.0) < 60:
+        return
+    _last_purge_times[directory] = now
+    for entry in os.scandir(directory):
+        try:
+            if now - entry.stat().st_mtime > REPORT_TTL_SECONDS:
+                os.remove(entry.path)
+        except OSError:
+            pass  # Already removed by another worker
+
+
+def write_json_atomic(path, data):
+    """Writes data as JSON under a temporary name and renames it into place, so readers never see a partial file."""
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+
+def save_report(report_bytes, filename, file_type):
+    """
+    Writes a generated report to the report store and returns its id.
+    The report body and a small metadata file are written under temporary names and renamed into
+    place, so a concurrent GET never sees a partially written report.
+    """
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    purge_expired_files(REPORTS_DIR)
+    report_id = uuid.uuid4().hex
+    name_without_ext = filename.rsplit('.', 1)[0] if '.' in filename else filename
+    report_path = os.path.join(REPORTS_DIR, f'{report_id}.bin')
+    with open(report_path + '.tmp', 'wb') as f:
+        f.write(report_bytes)
+    os.replace(report_path + '.tmp', report_path)
+    write_json_atomic(os.path.join(REPORTS_DIR, f'{report_id}.json'), {
+        'file_type': file_type,
+        'download_name': f'{name_without_ext}_compatibility_report.{file_type}',
+    })
+    return report_id
+
+
+def file_type_from_filename(filename):
+    """Returns the lower-cased extension of filename (e.g. 'docx'), or None if it has none."""
+    if filename and '.' in filename:
+        return filename.rsplit('.', 1)[-1].lower()
+    return None
+
+
+def read_check_options(fields):
+    """
+    Picks the CHECK_OPTIONS present in fields (form data, query string or JSON body) into a dict.
+    Raises ValueError for values outside the allowed set.
+    """
+    options = {}
+    for name, allowed in CHECK_OPTIONS.items():
+        value = fields.get(name)
+        if value is None:
+            continue
+        if value not in allowed:
+            raise ValueError(f"Invalid {name} '{value}'. Expected one of: {', '.join(allowed)}.")
+        options[name] = value
+    return options
+
+
+def read_upload():
+    """
+    Extracts (input_file, filename, file_type, options) from the current request.
+    Supports three upload modes:
+      - multipart/form-data with the document in a 'file' field (filename/file_type/options as form fields),
+      - a raw application/octet-stream body (filename/file_type/options in the query string),
+      - the legacy JSON payload with file_base64, filename, file_type and options as keys.
+    input_file is a seekable binary stream for the first two modes and a base64 string for JSON.
+    Options may also be given in the query string for every mode.
+    Raises ValueError if the request carries no file data or an invalid option.
+    """
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            raise ValueError('No file data provided.')
+        filename = request.form.get('filename') or upload.filename or 'document.file'
+        file_type = request.form.get('file_type') or file_type_from_filename(filename)
+        options = read_check_options(dict(request.args.to_dict(), **request.form.to_dict()))
+        return upload.stream, filename, file_type, options
+
+    if request.mimetype == 'application/octet-stream':
+        filename = request.args.get('filename', 'document.file')
+        file_type = request.args.get('file_type') or file_type_from_filename(filename)
+        options = read_check_options(request.args)
+        # request.stream is not seekable, but the zip readers behind every checker need to seek.
+        spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_BYTES)
+        shutil.copyfileobj(request.stream, spool)
+        if spool.tell() == 0:
+            raise ValueError('No file data provided.')
+        spool.seek(0)
+        return spool, filename, file_type, options
+
+    data = request.get_json(silent=True) or {}
+    file_base64 = data.get('file_base64')
+    if not file_base64:
+        raise ValueError('No file data provided.')
+    options = read_check_options(dict(request.args.to_dict(), **data))
+    return file_base64, data.get('filename', 'document.file'), data.get('file_type'), options
+
+
+def report_fields(output_bytes, filename, file_type):
+    """
+    Saves a generated report and returns the report_id/report_url response fields.
+    Returns an empty dict when no report was built (scan mode).
+    """
+    if output_bytes is None:
+        return {}
+    report_id = save_report(output_bytes, filename, file_type)
+    return {'report_id': report_id, 'report_url': f'/reports/{report_id}'}
+
+
+# --- Background jobs ---
+# Job state lives in one JSON file per job under JOBS_DIR so that GET /jobs/<id> works on any
+# gunicorn worker, not just the one whose pool is running the check. Pool threads only supervise;
+# each check runs in its own isolated child process (see run_isolated), so at most JOB_WORKERS
+# check processes run per gunicorn worker.
+JOBS_DIR = os.environ.get('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'officecheck-jobs'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+# A /jobs/<id>/events stream ends after this long and the client's EventSource reconnects, so no single
+# request outlives the server's worker timeout
+JOB_EVENTS_MAX_SECONDS = float(os.environ.get('JOB_EVENTS_MAX_SECONDS', 25))
+# Grace period past CHECK_TIMEOUT_SECONDS after which a job still marked running is reported as failed
+JOB_STALE_GRACE_SECONDS = 60
+
+_job_executor = None
+
+
+def get_job_executor():
+    """
+    Returns this process's job pool, creating it on first use.
+    The pool is created lazily so that each gunicorn worker gets its own after forking.
+    """
+    global _job_executor
+    if _job_executor is None:
+        _job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='check-job')
+    return _job_executor
+
+
+def job_status_path(job_id):
+    return os.path.join(JOBS_DIR, f'{job_id}.json')
+
+
+def process_alive(pid):
+    """Returns True if a process with id pid exists on this host."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_job_status(job_id):
+    """
+    Loads a job's status file, or returns None if there is none. A queued or running job whose owning
+    gunicorn worker has exited, or that has been running past its time budget, can never finish: it is
+    marked failed here so that pollers and event streams end.
+    """
+    try:
+        with open(job_status_path(job_id)) as f:
+            status = json.load(f)
+    except OSError:
+        return None
+    if status.get('status') not in ('queued', 'running'):
+        return status
+    owner_gone = status.get('owner_pid') is not None and not process_alive(status['owner_pid'])
+    overdue = (status.get('status') == 'running' and CHECK_TIMEOUT_SECONDS > 0
+               and time.time() - status.get('started_at', time.time()) > CHECK_TIMEOUT_SECONDS + JOB_STALE_GRACE_SECONDS)
+    if owner_gone or overdue:
+        update_job_status(job_id, status='failed',
+                          error='The check was interrupted because the server process running it stopped. '
+                                'Please submit the file again.')
+        with open(job_status_path(job_id)) as f:
+            status = json.load(f)
+    return status
+
+
+def update_job_status(job_id, **fields):
+    """Merges fields into the job's status file."""
+    path = job_status_path(job_id)
+    try:
+        with open(path) as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        status = {'job_id': job_id}
+    status.update(fields, updated_at=time.time())
+    write_json_atomic(path, status)
+
+
+def job_progress_writer(job_id, min_interval=0.5):
+    """
+    Returns a progress callback that records the latest event in the job's status file.
+    Writes are throttled to one per min_interval seconds; the final event of a stage is always written.
+    """
+    last_write = [0.0]
+
+    def progress(event):
+        now = time.monotonic()
+        if now - last_write[0] >= min_interval or event['current'] == event['total']:
+            last_write[0] = now
+            update_job_status(job_id, progress=event)
+
+    return progress
+
+
+def run_job(job_id, file_type, input_path, filename, options):
+    """
+    Executes a queued check on a job pool thread and records the outcome in the job's status file.
+    Returns the (success, output_bytes, issues) result so it can be cached.
+    The uploaded input is deleted once the check finishes.
+    """
+    try:
+        update_job_status(job_id, status='running', started_at=time.time())
+        with open(input_path, 'rb') as input_file:
+            success, output_bytes, issues = run_check(file_type, input_file, filename,
+                                                      progress=job_progress_writer(job_id), **options)
+        if success:
+            update_job_status(job_id, status='done', issues_found=issues,
+                              **report_fields(output_bytes, filename, file_type))
+        else:
+            update_job_status(job_id, status='failed',
+                              error=issues[0] if issues else 'Unknown error during processing.')
+        return success, output_bytes, issues
+    except (BudgetExceeded, PackageRejected) as e:
+        update_job_status(job_id, status='failed', **e.to_dict())
+        return False, b'', [str(e)]
+    except Exception as e:
+        traceback.print_exc()
+        update_job_status(job_id, status='failed', error=str(e))
+        return False, b'', [str(e)]
+    finally:
+        try:
+            os.remove(input_path)
+        except OSError:
+            pass
+
+
+def on_job_future_done(job_id, cache_key, admission_ticket, future):
+    """Releases the job's admission budget and caches a successful result."""
+    admission.release(admission_ticket)
+    exception = future.exception()
+    if exception is not None:
+        update_job_status(job_id, status='failed', error=f'The check could not be completed: {exception}')
+        return
+    success, output_bytes, issues = future.result()
+    if success:
+        result_cache.put(cache_key, issues, output_bytes)
+
+
+def enqueue_job(input_file, filename, file_type, options):
+    """
+    Saves the upload to JOBS_DIR, submits it to the job pool and returns the new job id.
+    A result cache hit completes the job immediately without using the pool.
+    Otherwise the job holds admission budget from submission until it finishes; POST /jobs answers at
+    once, so it does not wait in the admission queue and raises AdmissionRejected if the budget is taken.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    purge_expired_files(JOBS_DIR)
+    job_id = uuid.uuid4().hex
+    input_path = os.path.join(JOBS_DIR, f'{job_id}.input')
+    with open(input_path, 'wb') as f:
+        digest = copy_and_hash(open_input_file(input_file), f)
+    update_job_status(job_id, status='queued', filename=filename, file_type=file_type, options=options,
+                      created_at=time.time(), owner_pid=os.getpid())
+
+    cache_key = result_cache_key(digest, file_type, filename, options)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        os.remove(input_path)
+        issues, output_bytes = cached
+        update_job_status(job_id, status='done', issues_found=issues, cached=True,
+                          **report_fields(output_bytes, filename, file_type))
+        return job_id
+
+    try:
+        admission_ticket = admission.acquire(estimate_check_cost(file_type, os.path.getsize(input_path)), timeout=0)
+    except AdmissionRejected:
+        os.remove(input_path)
+        os.remove(job_status_path(job_id))
+        raise
+    future = get_job_executor().submit(run_job, job_id, file_type, input_path, filename, options)
+    future.add_done_callback(functools.partial(on_job_future_done, job_id, cache_key, admission_ticket))
+    return job_id
+
+
+# --- Batch checks ---
+# Batches run on their own pool, one isolated check process per core by default, so a large batch
+# uses every core without queueing ahead of /jobs submissions on the job pool.
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 500))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+
+_batch_executor = None
+
+
+def get_batch_executor():
+    """Returns this process's batch pool, creating it on first use (after gunicorn forks, as for jobs)."""
+    global _batch_executor
+    if _batch_executor is None:
+        _batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='check-batch')
+    return _batch_executor
+
+
+def check_file_path(file_type, path, filename, options):
+    """
+    Runs the checker on a file saved on disk and returns (success, output_bytes, issues, elapsed_seconds).
+    Batch members are kept on disk rather than in memory until their check starts. Decks are analysed
+    serially: the batch pool already runs BATCH_WORKERS checks at once, and each of them starting
+    PPTX_SLIDE_WORKERS slide processes would oversubscribe the cores outside the admission budget.
+    """
+    if file_type == 'pptx':
+        options = dict(options, slide_workers=1)
+    started = time.perf_counter()
+    with open(path, 'rb') as input_file:
+        success, output_bytes, issues = run_check(file_type, input_file, filename, **options)
+    return success, output_bytes, issues, round(time.perf_counter() - started, 3)
+
+
+def extract_batch_members(archive, work_dir):
+    """
+    Writes every supported Office file in the batch zip to work_dir and returns a list of
+    (member_name, file_type, path, digest) tuples in archive order, digest being the file's SHA-256.
+    Files are saved under generated names, so member paths inside the archive are never used on disk.
+    Raises ValueError if the archive holds no supported files or more than BATCH_MAX_FILES of them,
+    and PackageRejected if the archive itself exceeds the package size limits.
+    """
+    check_package_limits(archive)
+    members = []
+    for info in archive.infolist():
+        member_name = info.filename
+        base_name = member_name.rsplit('/', 1)[-1]
+        file_type = file_type_from_filename(base_name)
+        if (info.is_dir() or file_type not in CHECKERS or base_name.startswith(('.', '~$'))
+                or member_name.startswith('__MACOSX/')):
+            continue  # Skip folders, other files, and OS/Office lock-file litter
+        members.append((info, member_name, file_type))
+
+    if not members:
+        raise ValueError('The archive contains no .docx, .pptx, .xlsx or .xlsm files.')
+    if len(members) > BATCH_MAX_FILES:
+        raise ValueError(f'The archive contains {len(members)} files; the limit is {BATCH_MAX_FILES} per batch.')
+
+    extracted = []
+    for idx, (info, member_name, file_type) in enumerate(members):
+        path = os.path.join(work_dir, f'{idx:06d}.{file_type}')
+        with archive.open(info) as src, open(path, 'wb') as dst:
+            digest = copy_and_hash(src, dst)
+        extracted.append((member_name, file_type, path, digest))
+    return extracted
+
+
+def estimate_batch_cost(members):
+    """
+    Estimates a batch's peak memory: the pool runs BATCH_WORKERS members at a time, so the batch can
+    at most hold the BATCH_WORKERS most expensive members in memory at once.
+    """
+    costs = sorted((estimate_check_cost(file_type, os.path.getsize(path))
+                    for _, file_type, path, _ in members), reverse=True)
+    return sum(costs[:BATCH_WORKERS])
+
+
+def submit_batch_member(executor, member, options):
+    """
+    Returns a future for one batch member's check. Result cache hits come back as an already
+    completed future, so they never occupy a pool worker.
+    """
+    member_name, file_type, path, digest = member
+    cached = result_cache.get(result_cache_key(digest, file_type, member_name, options))
+    if cached is None:
+        return executor.submit(check_file_path, file_type, path, member_name, options)
+    issues, output_bytes = cached
+    future = Future()
+    future.set_result((True, output_bytes, issues, 0.0))
+    future.cached = True
+    return future
+
+
+def batch_result_entry(member, future, options):
+    """
+    Collects a finished batch future into (entry, output_bytes) and caches fresh successful results.
+    entry carries the same keys as a /check-compatibility response (success, issues_found or error)
+    plus filename, file_type and elapsed_seconds.
+    """
+    member_name, file_type, path, digest = member
+    entry = {'filename': member_name, 'file_type': file_type}
+    try:
+        success, output_bytes, issues, elapsed = future.result()
+    except (BudgetExceeded, PackageRejected) as e:
+        entry.update(e.to_dict(), elapsed_seconds=None)
+        return entry, b''
+    except Exception as e:
+        success, output_bytes, issues, elapsed = False, b'', [f'The check could not be completed: {e}'], None
+    entry['success'] = success
+    if success:
+        entry['issues_found'] = issues
+        if getattr(future, 'cached', False):
+            entry['cached'] = True
+        else:
+            result_cache.put(result_cache_key(digest, file_type, member_name, options), issues, output_bytes)
+    else:
+        entry['error'] = issues[0] if issues else 'Unknown error during processing.'
+    entry['elapsed_seconds'] = elapsed
+    return entry, output_bytes
+
+
+def stream_batch_results(members, futures, options, work_dir, admission_ticket):
+    """
+    Yields one NDJSON line per batch file in completion order. Reports go to the report store as soon
+    as each file finishes, so nothing is buffered beyond the file currently being written.
+    The work directory is removed, unfinished checks cancelled and the batch's admission budget released
+    when the stream ends or the client disconnects.
+    """
+    member_by_future = dict(zip(futures, members))
+    try:
+        for future in as_completed(futures):
+            member = member_by_future.pop(future)
+            entry, output_bytes = batch_result_entry(member, future, options)
+            if entry['success']:
+                entry.update(report_fields(output_bytes, entry['filename'].rsplit('/', 1)[-1], entry['file_type']))
+            yield json.dumps(entry) + '\n'
+    finally:
+        for future in member_by_future:
+            future.cancel()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        admission.release(admission_ticket)
+
+
+def report_name_for(member_name, file_type):
+    """Returns the report's name inside the output zip, keeping the member's folder."""
+    name_without_ext = member_name.rsplit('.', 1)[0]
+    return f'{name_without_ext}_compatibility_report.{file_type}'
+
 
 # Root route for server health check
 @app.route('/', methods=['GET'])
@@ -572,33 +3112,49 @@ def home():
 def check_compatibility_route():
     """
     Handles POST requests for file compatibility checks.
-    Expects file_base64, filename, and file_type in the JSON payload.
+    Responds 503 with Retry-After when the server is too busy to admit the check, 422 with
+    error_code 'budget_exceeded' when the check runs out of its time or memory budget, and 413 with
+    error_code 'package_rejected' when the package exceeds the size limits.
+    Accepts a multipart/form-data upload ('file' field), a raw application/octet-stream body,
+    or the legacy JSON payload with file_base64, filename and file_type.
+    Responds with issues_found and a report_id/report_url to download the report from;
+    legacy JSON requests also get the report inline as output_file_base64.
+    With mode=scan only issues_found is returned and no report is generated.
+    With mode=compact a Word report holds only the flagged paragraphs and tables.
     """
     try:
-        data = request.get_json()
-        file_base64 = data.get('file_base64')
-        filename = data.get('filename', 'document.file')
-        file_type = data.get('file_type')  # e.g., 'docx', 'pptx', 'xlsx'
-
-        if not file_base64:
-            return jsonify({'success': False, 'error': 'No file data provided.'}), 400
+        try:
+            input_file, filename, file_type, options = read_upload()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
 
         # Determine which checker function to call based on file_type
-        if file_type == 'docx':
-            success, output_base64, issues = check_word_google_docs_compatibility(file_base64, filename)
-        elif file_type == 'pptx':
-            success, output_base64, issues = check_powerpoint_google_slides_compatibility(file_base64, filename)
-        elif file_type == 'xlsx' or file_type == 'xlsm':
-            success, output_base64, issues = check_excel_google_sheets_compatibility(file_base64, filename)
-        else:
+        if file_type not in CHECKERS:
             return jsonify({'success': False, 'error': 'Unsupported file type provided.'}), 400
+        legacy_json = isinstance(input_file, str)
+        input_file = open_input_file(input_file)
+        try:
+            success, output_bytes, issues, cached = run_check_cached(file_type, input_file, filename, options,
+                                                                     copy_and_hash(input_file))
+        except AdmissionRejected as e:
+            return admission_rejected_response(e)
+        except BudgetExceeded as e:
+            return jsonify(e.to_dict()), 422
+        except PackageRejected as e:
+            return jsonify(e.to_dict()), 413
 
         if success:
-            return jsonify({
+            response = {
                 'success': True,
-                'output_file_base64': output_base64,
-                'issues_found': issues
-            })
+                'issues_found': issues,
+                **report_fields(output_bytes, filename, file_type)
+            }
+            if cached:
+                response['cached'] = True
+            if legacy_json and output_bytes is not None:
+                # Legacy JSON clients read the report inline from the response
+                response['output_file_base64'] = base64.b64encode(output_bytes).decode('utf-8')
+            return jsonify(response)
         else:
             # If checker function returns False, issues list contains the error message
             return jsonify({
@@ -612,6 +3168,212 @@ def check_compatibility_route():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+# Package triage endpoint
+@app.route('/triage', methods=['POST'])
+def triage_route():
+    """
+    Returns a part inventory and quick risk classification for an Office file, read from the zip
+    central directory and [Content_Types].xml only. Accepts the same upload modes as /check-compatibility.
+    """
+    try:
+        try:
+            input_file, _, _, _ = read_upload()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        started = time.perf_counter()
+        try:
+            triage = triage_package(open_input_file(input_file))
+        except zipfile.BadZipFile:
+            return jsonify({'success': False, 'error': 'The uploaded file is not a valid Office (OOXML) package.'}), 400
+        triage['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return jsonify(dict(success=True, **triage))
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# Asynchronous check endpoints
+@app.route('/jobs', methods=['POST'])
+def create_job_route():
+    """
+    Queues a compatibility check and returns its job id immediately (HTTP 202).
+    Accepts the same upload modes as /check-compatibility. Poll GET /jobs/<id> for the result.
+    Responds 503 with Retry-After when this worker's admission budget is fully taken.
+    """
+    try:
+        try:
+            input_file, filename, file_type, options = read_upload()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if file_type not in CHECKERS:
+            return jsonify({'success': False, 'error': 'Unsupported file type provided.'}), 400
+
+        try:
+            job_id = enqueue_job(input_file, filename, file_type, options)
+        except AdmissionRejected as e:
+            return admission_rejected_response(e)
+        return jsonify({'success': True, 'job_id': job_id, 'status': 'queued',
+                        'status_url': f'/jobs/{job_id}'}), 202
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status_route(job_id):
+    """
+    Returns a job's status: 'queued', 'running', 'done' (with issues_found and report_url) or 'failed' (with error).
+    """
+    if not REPORT_ID_PATTERN.match(job_id):
+        abort(404)
+    try:
+        status = read_job_status(job_id)
+    except ValueError:
+        status = None
+    if status is None:
+        return jsonify({'success': False, 'error': 'Job not found or expired.'}), 404
+    return jsonify(dict(status, success=status.get('status') != 'failed'))
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events_route(job_id):
+    """
+    Server-Sent Events stream of a job's progress. Sends a 'progress' event whenever the job's
+    status or progress changes, then a final 'done' or 'failed' event carrying the full job status.
+    The stream ends without a final event after JOB_EVENTS_MAX_SECONDS; EventSource clients then
+    reconnect on their own and pick up the current status. Clients can enforce their own deadline by
+    closing the stream.
+    """
+    if not REPORT_ID_PATTERN.match(job_id):
+        abort(404)
+    if not os.path.exists(job_status_path(job_id)):
+        return jsonify({'success': False, 'error': 'Job not found or expired.'}), 404
+
+    def generate():
+        last_sent = None
+        last_heartbeat = time.monotonic()
+        end_at = time.monotonic() + JOB_EVENTS_MAX_SECONDS
+        yield 'retry: 1000\n\n'  # Reconnect a second after the stream ends
+        while time.monotonic() < end_at:
+            try:
+                status = read_job_status(job_id)
+            except ValueError:
+                status = {}  # Caught mid-replace on a filesystem without atomic rename; poll again
+            if status is None:
+                yield f"event: failed\ndata: {json.dumps({'success': False, 'error': 'Job not found or expired.'})}\n\n"
+                return
+
+            if status:
+                if status.get('status') in ('done', 'failed'):
+                    final = dict(status, success=status['status'] == 'done')
+                    yield f"event: {status['status']}\ndata: {json.dumps(final)}\n\n"
+                    return
+                update = {'job_id': job_id, 'status': status.get('status'), 'progress': status.get('progress')}
+                if update != last_sent:
+                    last_sent = update
+                    last_heartbeat = time.monotonic()
+                    yield f"event: progress\ndata: {json.dumps(update)}\n\n"
+
+            if time.monotonic() - last_heartbeat > 15:
+                last_heartbeat = time.monotonic()
+                yield ': keep-alive\n\n'  # Comment line; stops proxies from closing an idle stream
+            time.sleep(0.25)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# Batch endpoint
+@app.route('/check-batch', methods=['POST'])
+def check_batch_route():
+    """
+    Checks every .docx/.pptx/.xlsx/.xlsm file inside an uploaded zip archive in parallel across the
+    batch pool. Accepts the same upload modes as /check-compatibility.
+    By default responds with a zip holding one report per successfully checked file plus manifest.json,
+    which lists success, issues_found (or error), elapsed_seconds and the report name for every file.
+    With format=ndjson (query string or form field) or an Accept: application/x-ndjson header, responds
+    with one JSON line per file as each check finishes, each carrying a report_url into the report store.
+    """
+    try:
+        try:
+            input_file, _, _, options = read_upload()
+            archive = zipfile.ZipFile(open_input_file(input_file))
+        except zipfile.BadZipFile:
+            return jsonify({'success': False, 'error': 'The uploaded batch is not a valid zip archive.'}), 400
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        work_dir = tempfile.mkdtemp(prefix='officecheck-batch-')
+        try:
+            members = extract_batch_members(archive, work_dir)
+        except ValueError as e:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except PackageRejected as e:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return jsonify(e.to_dict()), 413
+
+        try:
+            admission_ticket = admission.acquire(estimate_batch_cost(members))
+        except AdmissionRejected as e:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return admission_rejected_response(e)
+
+        executor = get_batch_executor()
+        futures = [submit_batch_member(executor, member, options) for member in members]
+
+        response_format = request.args.get('format') or request.form.get('format')
+        if response_format == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+            return Response(stream_batch_results(members, futures, options, work_dir, admission_ticket),
+                            mimetype='application/x-ndjson')
+
+        try:
+            output_file = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_BYTES)
+            manifest = []
+            with zipfile.ZipFile(output_file, 'w', compression=zipfile.ZIP_DEFLATED) as output_zip:
+                for member, future in zip(members, futures):
+                    entry, output_bytes = batch_result_entry(member, future, options)
+                    if entry['success'] and output_bytes is not None:
+                        entry['report'] = report_name_for(entry['filename'], entry['file_type'])
+                        output_zip.writestr(entry['report'], output_bytes)
+                    manifest.append(entry)
+                output_zip.writestr('manifest.json', json.dumps({'files': manifest}, indent=2))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            admission.release(admission_ticket)
+
+        output_file.seek(0)
+        return send_file(output_file, mimetype='application/zip', as_attachment=True,
+                         download_name='compatibility_reports.zip')
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# Report download endpoint
+@app.route('/reports/<report_id>', methods=['GET'])
+def download_report_route(report_id):
+    """Streams a stored report with its Office Content-Type and Content-Length."""
+    if not REPORT_ID_PATTERN.match(report_id):
+        abort(404)
+    try:
+        with open(os.path.join(REPORTS_DIR, f'{report_id}.json')) as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return jsonify({'success': False, 'error': 'Report not found or expired.'}), 404
+
+    try:
+        return send_file(os.path.join(REPORTS_DIR, f'{report_id}.bin'),
+                         mimetype=REPORT_MIME_TYPES.get(metadata['file_type'], 'application/octet-stream'),
+                         as_attachment=True, download_name=metadata['download_name'])
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': 'Report not found or expired.'}), 404
+
+
 # Entry point for running the Flask app
 if __name__ == '__main__':
     # Run the app in debug mode locally, accessible from any IP on port 5000
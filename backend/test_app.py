@@ -0,0 +1,122 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from docx import Document
+from pptx import Presentation
+from pptx.util import Inches, Pt
+
+import app
+
+
+def make_deck(slides=12):
+    """Returns a .pptx with a title, a 20 pt and a 40 pt paragraph on every slide."""
+    prs = Presentation()
+    for slide_idx in range(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.title.text = f'Slide {slide_idx + 1}'
+        text_frame = slide.shapes.add_textbox(Inches(1), Inches(2), Inches(6), Inches(2)).text_frame
+        for size in (20, 40):
+            paragraph = text_frame.add_paragraph()
+            paragraph.text = f'{size} pt text'
+            paragraph.font.size = Pt(size)
+    output = io.BytesIO()
+    prs.save(output)
+    return output.getvalue()
+
+
+class ParallelSlideAnalysisTest(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = app.PPTX_PARALLEL_MIN_SLIDES, app.PPTX_SLIDE_WORKERS
+        app.PPTX_PARALLEL_MIN_SLIDES = 2
+
+    def tearDown(self):
+        app.PPTX_PARALLEL_MIN_SLIDES, app.PPTX_SLIDE_WORKERS = self.settings
+
+    def test_workers_match_serial_analysis(self):
+        prs = Presentation(io.BytesIO(make_deck()))
+        app.PPTX_SLIDE_WORKERS = 1
+        serial = app.analyse_slides(prs, True)
+        app.PPTX_SLIDE_WORKERS = 4
+        self.assertEqual(app.analyse_slides(prs, True), serial)
+
+    def test_report_keeps_font_sizes_with_workers(self):
+        app.PPTX_SLIDE_WORKERS = 4
+        success, output, issues = app.check_powerpoint_google_slides_compatibility(make_deck(), 'deck.pptx')
+        self.assertTrue(success, issues)
+        report = Presentation(io.BytesIO(output))
+        sizes = {paragraph.font.size.pt for slide in list(report.slides)[1:] for shape in slide.shapes
+                 if shape.has_text_frame for paragraph in shape.text_frame.paragraphs if paragraph.font.size}
+        self.assertEqual(sizes, {20, 40})
+
+    def test_batch_members_analyse_slides_serially(self):
+        app.PPTX_SLIDE_WORKERS = 4
+        serial_only = mock.patch.object(app, 'ProcessPoolExecutor', side_effect=AssertionError('slide workers started'))
+        with tempfile.NamedTemporaryFile(suffix='.pptx') as deck, serial_only:
+            deck.write(make_deck())
+            deck.flush()
+            success, _, issues, _ = app.check_file_path('pptx', deck.name, 'deck.pptx', {})
+        self.assertTrue(success, issues)
+
+
+def make_document(paragraphs=50):
+    """Returns a small .docx with a heading and numbered paragraphs."""
+    document = Document()
+    document.add_heading('Isolated check', 1)
+    for paragraph_idx in range(paragraphs):
+        document.add_paragraph(f'Paragraph {paragraph_idx + 1}')
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+class ConcurrentIsolatedCheckTest(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = app.result_cache, app.CHECK_TIMEOUT_SECONDS
+        self.cache_dir = tempfile.TemporaryDirectory()
+        app.result_cache = app.SqliteResultCache(os.path.join(self.cache_dir.name, 'cache.sqlite3'),
+                                                 64 * 1024 * 1024, 3600)
+        app.CHECK_TIMEOUT_SECONDS = 30
+
+    def tearDown(self):
+        app.result_cache, app.CHECK_TIMEOUT_SECONDS = self.settings
+        self.cache_dir.cleanup()
+
+    def test_checks_forked_while_other_threads_use_locks_finish(self):
+        # Other threads write the SQLite cache and parse documents with python-docx while checks fork
+        stop = threading.Event()
+
+        def write_cache():
+            count = 0
+            while not stop.is_set():
+                app.result_cache.put(f'busy|{count}', ['issue'], b'x' * 4096)
+                count += 1
+
+        def check(idx):
+            return app.run_check('docx', make_document(50 + idx), f'doc{idx}.docx')
+
+        writer = threading.Thread(target=write_cache)
+        writer.start()
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(check, range(16)))
+        finally:
+            stop.set()
+            writer.join()
+        for success, _, issues in results:
+            self.assertTrue(success, issues)
+
+    def test_check_process_cannot_use_result_cache(self):
+        success, _, issues = app.run_isolated(lambda: app.result_cache.get('key'))
+        self.assertFalse(success)
+        self.assertIn('result_cache must not be used', issues[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
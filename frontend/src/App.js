@@ -2,12 +2,15 @@ import React, { useState } from 'react';
 import JSZip from 'jszip'; // Import JSZip library
 import { saveAs } from 'file-saver'; // For saving the generated zip file
 
+// How many times a file is submitted while the server answers 503 (busy)
+const MAX_SUBMIT_ATTEMPTS = 5;
+
 function App() {
     const [selectedFiles, setSelectedFiles] = useState([]); // Array to hold multiple selected files
     const [processing, setProcessing] = useState(false); // Overall processing state
     const [globalError, setGlobalError] = useState(''); // General error for the whole process
     // Array to store results for each processed file:
-    // { id, originalFileName, originalFileType, outputBase64, issuesFound, status, error }
+    // { id, originalFileName, originalFileType, reportUrl, issuesFound, status, error }
     const [reports, setReports] = useState([]);
     const [allReportsGenerated, setAllReportsGenerated] = useState(false); // State for "Download All" button visibility
     const [downloadAllMessage, setDownloadAllMessage] = useState(''); // Message for download all status
@@ -22,6 +25,31 @@ function App() {
         setDownloadAllMessage(''); // Clear download all message
     };
 
+    // Follows a queued job's Server-Sent Events stream, calling onProgress with each progress message.
+    // Resolves with the final job status (done or failed).
+    const waitForJob = (apiUrl, jobId, onProgress) => new Promise((resolve, reject) => {
+        const events = new EventSource(`${apiUrl}/jobs/${jobId}/events`);
+        events.addEventListener('progress', (event) => {
+            const data = JSON.parse(event.data);
+            if (data.progress) {
+                onProgress(data.progress.message);
+            }
+        });
+        const finish = (event) => {
+            events.close();
+            resolve(JSON.parse(event.data));
+        };
+        events.addEventListener('done', finish);
+        events.addEventListener('failed', finish);
+        events.onerror = () => {
+            // The server ends each stream after a while and the browser reconnects by itself;
+            // only a stream the browser has given up on (e.g. the job is gone) is an error.
+            if (events.readyState === EventSource.CLOSED) {
+                reject(new Error('Lost connection to the server while waiting for the report.'));
+            }
+        };
+    });
+
     // Function to handle report generation for all selected files
     const handleGenerateReports = async () => {
         if (selectedFiles.length === 0) {
@@ -50,47 +78,57 @@ function App() {
                 originalFileName,
                 originalFileType,
                 status: 'Processing...',
-                outputBase64: '',
+                progressMessage: '',
+                reportUrl: '',
                 issuesFound: [],
                 error: ''
             };
             setReports([...newReports]); // Update UI with processing status
 
-            const reader = new FileReader();
-            const readPromise = new Promise((resolve, reject) => {
-                reader.onloadend = () => resolve(reader.result);
-                reader.onerror = () => reject(new Error('Failed to read file.'));
-                reader.readAsDataURL(file);
-            });
-
             try {
-                const base64StringWithPrefix = await readPromise;
-                const base64String = base64StringWithPrefix.split(',')[1]; // Extract Base64 part
-
                 const apiUrl = process.env.REACT_APP_API_URL;
                 if (!apiUrl) {
                     throw new Error('Backend API URL is not configured. Please check environment variables.');
                 }
 
-                const response = await fetch(`${apiUrl}/check-compatibility`, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({
-                        file_base64: base64String,
-                        filename: originalFileName,
-                        file_type: originalFileType,
-                    }),
-                });
+                // Send the raw file as multipart/form-data (no base64 inflation on the wire)
+                const formData = new FormData();
+                formData.append('file', file, originalFileName);
+                formData.append('filename', originalFileName);
+                formData.append('file_type', originalFileType);
+
+                // Queue the check, then follow its progress until it finishes.
+                // A busy server answers 503 with Retry-After; wait and retry a few times before giving up.
+                let response;
+                for (let attempt = 1; ; attempt++) {
+                    response = await fetch(`${apiUrl}/jobs`, {
+                        method: 'POST',
+                        body: formData,
+                    });
+                    if (response.status !== 503 || attempt === MAX_SUBMIT_ATTEMPTS) {
+                        break;
+                    }
+                    const retryAfterSeconds = parseInt(response.headers.get('Retry-After'), 10) || 10;
+                    newReports[fileId] = { ...newReports[fileId], progressMessage: `Server busy, retrying in ${retryAfterSeconds}s` };
+                    setReports([...newReports]);
+                    await new Promise((resolve) => setTimeout(resolve, retryAfterSeconds * 1000));
+                }
+
+                const job = await response.json();
+                if (!job.success) {
+                    throw new Error(job.error || 'The server could not queue this file.');
+                }
 
-                const data = await response.json();
+                const data = await waitForJob(apiUrl, job.job_id, (progressMessage) => {
+                    newReports[fileId] = { ...newReports[fileId], progressMessage };
+                    setReports([...newReports]); // Show live progress for the current file
+                });
 
                 if (data.success) {
                     newReports[fileId] = {
                         ...newReports[fileId],
                         status: 'Generated',
-                        outputBase64: data.output_file_base64,
+                        reportUrl: data.report_url,
                         issuesFound: data.issues_found,
                         error: ''
                     };
@@ -122,36 +160,32 @@ function App() {
         }
     };
 
-    // Function to handle downloading a specific generated report
-    const handleDownloadReport = (outputBase64, originalFileName, originalFileType) => {
-        if (outputBase64) {
-            const link = document.createElement('a');
-            // Construct the data URL based on the file type
-            let mimeType;
-            switch (originalFileType) {
-                case 'docx':
-                    mimeType = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document';
-                    break;
-                case 'pptx':
-                    mimeType = 'application/vnd.openxmlformats-officedocument.presentationml.presentation';
-                    break;
-                case 'xlsx':
-                case 'xlsm':
-                    mimeType = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet';
-                    break;
-                default:
-                    mimeType = 'application/octet-stream'; // Generic binary
-            }
-
-            link.href = `data:${mimeType};base64,${outputBase64}`;
+    // Fetches a generated report from the backend's report store as a Blob
+    const fetchReportBlob = async (reportUrl) => {
+        const apiUrl = process.env.REACT_APP_API_URL;
+        const response = await fetch(`${apiUrl}${reportUrl}`);
+        if (!response.ok) {
+            throw new Error(`Report download failed (HTTP ${response.status}). It may have expired; please regenerate it.`);
+        }
+        return response.blob();
+    };
 
-            // Determine a suitable filename for download
-            const nameWithoutExt = originalFileName.substring(0, originalFileName.lastIndexOf('.')) || originalFileName;
-            link.download = `${nameWithoutExt}_compatibility_report.${originalFileType}`;
+    // Builds the download filename for a report
+    const reportFileName = (originalFileName, originalFileType) => {
+        const nameWithoutExt = originalFileName.substring(0, originalFileName.lastIndexOf('.')) || originalFileName;
+        return `${nameWithoutExt}_compatibility_report.${originalFileType}`;
+    };
 
-            document.body.appendChild(link);
-            link.click();
-            document.body.removeChild(link);
+    // Function to handle downloading a specific generated report
+    const handleDownloadReport = async (reportUrl, originalFileName, originalFileType) => {
+        if (reportUrl) {
+            try {
+                const blob = await fetchReportBlob(reportUrl);
+                saveAs(blob, reportFileName(originalFileName, originalFileType));
+            } catch (err) {
+                console.error(`Error downloading report for ${originalFileName}:`, err);
+                setGlobalError(err.message);
+            }
         }
     };
 
@@ -161,22 +195,21 @@ function App() {
         const zip = new JSZip();
         let filesAdded = 0;
 
-        reports.forEach(report => {
-            if (report.status === 'Generated' && report.outputBase64) {
-                const nameWithoutExt = report.originalFileName.substring(0, report.originalFileName.lastIndexOf('.')) || report.originalFileName;
-                const fileNameInZip = `${nameWithoutExt}_compatibility_report.${report.originalFileType}`;
-                // Add the file to the zip. JSZip takes base64 string directly.
-                zip.file(fileNameInZip, report.outputBase64, { base64: true });
-                filesAdded++;
+        try {
+            for (const report of reports) {
+                if (report.status === 'Generated' && report.reportUrl) {
+                    // Add the file to the zip. JSZip takes Blobs directly.
+                    const blob = await fetchReportBlob(report.reportUrl);
+                    zip.file(reportFileName(report.originalFileName, report.originalFileType), blob);
+                    filesAdded++;
+                }
             }
-        });
 
-        if (filesAdded === 0) {
-            setDownloadAllMessage('No successfully generated reports to download.');
-            return;
-        }
+            if (filesAdded === 0) {
+                setDownloadAllMessage('No successfully generated reports to download.');
+                return;
+            }
 
-        try {
             const content = await zip.generateAsync({ type: "blob" });
             saveAs(content, "compatibility_reports.zip");
             setDownloadAllMessage('ZIP file downloaded successfully!');
@@ -254,6 +287,11 @@ function App() {
                 {processing && (
                     <div className="text-center text-indigo-600 font-medium text-lg mb-4">
                         Processing your files, please wait...
+                        {reports.filter((report) => report.status === 'Processing...').map((report) => (
+                            <p key={report.id} className="text-sm text-gray-600 mt-2">
+                                {report.originalFileName}: {report.progressMessage || 'Queued'}
+                            </p>
+                        ))}
                     </div>
                 )}
 
@@ -312,7 +350,7 @@ function App() {
 
                                         <div className="flex justify-center mt-4">
                                             <button
-                                                onClick={() => handleDownloadReport(report.outputBase64, report.originalFileName, report.originalFileType)}
+                                                onClick={() => handleDownloadReport(report.reportUrl, report.originalFileName, report.originalFileType)}
                                                 className={`px-6 py-2 rounded-full text-md font-bold transition-all duration-300
                                                             bg-green-500 text-white hover:bg-green-600 shadow-md hover:shadow-lg transform hover:-translate-y-0.5`}
                                             >